@@ -0,0 +1,112 @@
+import time
+import uuid
+
+from sqlalchemy import text
+
+from src.database.migrations import apply_migrations
+from src.database.record_database import RecordDatabase
+from src.models.record_database.base import Base
+
+ROWS = 1000000
+REPEATS = 20
+
+SEED_STATEMENTS = [
+    'ALTER TABLE {schema}.mails ALTER COLUMN sent_on TYPE VARCHAR, ALTER COLUMN received_on TYPE VARCHAR',
+    """
+    INSERT INTO {schema}.mails (id, entry_id, category, subject, sent_on, received_on, body, created_on, updated_on)
+    SELECT public.uuid_generate_v4(), upper(md5(i::text)),
+           (ARRAY['China Daily News', 'Market', 'Product', 'Other'])[1 + i % 4],
+           'Subject ' || i, to_char(timestamp '2020-01-01' + i * interval '1 minute', 'YYYY-MM-DD HH24:MI:SS'),
+           to_char(timestamp '2020-01-01' + i * interval '1 minute', 'YYYY-MM-DD HH24:MI:SS'), repeat('body ', 20),
+           timestamp '2020-01-01' + i * interval '1 minute', timestamp '2020-01-01' + i * interval '1 minute'
+    FROM generate_series(1, :rows) AS i
+    """,
+    """
+    INSERT INTO {schema}.document_segments (id, document_id, position, content, answer, keywords, enabled)
+    SELECT public.uuid_generate_v4(), md5((i / 5)::text)::uuid, i % 5, 'content ' || i, '', 'a,b', true
+    FROM generate_series(1, :rows) AS i
+    """,
+    """
+    INSERT INTO {schema}.document_backups (environment, dataset_name, document_name, segment_position, content, tag)
+    SELECT 'DEV', 'dataset', 'document ' || (i / 5), i % 5, 'content ' || i,
+           to_char(date '2020-01-01' + (i / 1000), 'YYYYMMDD') || '.name' || (i % 1000)
+    FROM generate_series(1, :rows) AS i
+    """,
+    'ANALYZE {schema}.mails',
+    'ANALYZE {schema}.document_segments',
+    'ANALYZE {schema}.document_backups',
+]
+
+QUERIES = {
+    'mail by entry id': (
+        'SELECT id FROM mails WHERE lower(entry_id) = lower(:entry_id)',
+        {'entry_id': '202CB962AC59075B964B07152D234B70'}
+    ),
+    'mails by category ordered by sent_on': (
+        "SELECT id, subject, sent_on FROM mails WHERE lower(category) IN ('china daily news') ORDER BY sent_on LIMIT 100",
+        {}
+    ),
+    'recently updated mails': (
+        "SELECT id FROM mails WHERE created_on >= :ago OR updated_on >= :ago",
+        {'ago': '2021-11-01'}
+    ),
+    'segments by document id': (
+        'SELECT id, position FROM document_segments WHERE document_id = md5(:document::text)::uuid',
+        {'document': 12345}
+    ),
+    'backups by tag prefix': (
+        "SELECT DISTINCT substring(tag, 10) FROM document_backups WHERE tag LIKE :prefix",
+        {'prefix': '20200315%'}
+    ),
+}
+
+
+def measure(connection) -> dict:
+    timings = {}
+    for name, (query, params) in QUERIES.items():
+        connection.execute(text(query), params).fetchall()
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            connection.execute(text(query), params).fetchall()
+        timings[name] = (time.perf_counter() - start) / REPEATS * 1000
+    return timings
+
+
+def main():
+    record_db = RecordDatabase('record')
+    schema = f'benchmark_{uuid.uuid4().hex[:8]}'
+    with record_db.engine.connect() as connection:
+        connection.execute(text(f'CREATE SCHEMA {schema}'))
+        connection.commit()
+        try:
+            Base.metadata.create_all(connection.execution_options(schema_translate_map={None: schema}))
+            connection.execute(text(f'SET search_path TO {schema}'))
+            connection.commit()
+            if connection.execute(text('SELECT current_schema()')).scalar() != schema:
+                raise RuntimeError(f'search_path does not point at benchmark schema "{schema}"')
+            for statement in SEED_STATEMENTS:
+                connection.execute(text(statement.format(schema=schema)), {'rows': ROWS})
+            connection.commit()
+            print(f'Seeded {ROWS} rows per table in schema "{schema}"')
+
+            before = measure(connection)
+            start = time.perf_counter()
+            apply_migrations(connection)
+            for table in ('mails', 'document_segments', 'document_backups'):
+                connection.execute(text(f'ANALYZE {table}'))
+            connection.commit()
+            print(f'Migrations applied in {time.perf_counter() - start:.1f}s')
+            after = measure(connection)
+
+            print(f"{'query':<40}{'before (ms)':>14}{'after (ms)':>14}")
+            for name in QUERIES:
+                print(f'{name:<40}{before[name]:>14.2f}{after[name]:>14.2f}')
+        finally:
+            connection.rollback()
+            connection.execute(text(f'DROP SCHEMA {schema} CASCADE'))
+            connection.execute(text('RESET search_path'))
+            connection.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import boto3
+from moto import mock_aws
+
+from src.services.s3_handler import S3Handler
+
+BUCKET = 'benchmark'
+REGION = 'us-east-1'
+SMALL_FILES = 500
+SMALL_FILE_SIZE = 64 * 1024
+LARGE_FILES = 4
+LARGE_FILE_SIZE = 32 * 1024 * 1024
+
+
+def seed(client) -> list[str]:
+    client.create_bucket(Bucket=BUCKET)
+    keys = []
+    for index in range(SMALL_FILES):
+        key = f'upload_files/tenant/{index:05d}.png'
+        client.put_object(Bucket=BUCKET, Key=key, Body=os.urandom(SMALL_FILE_SIZE))
+        keys.append(key)
+    for index in range(LARGE_FILES):
+        key = f'upload_files/large/{index:05d}.bin'
+        client.put_object(Bucket=BUCKET, Key=key, Body=os.urandom(LARGE_FILE_SIZE))
+        keys.append(key)
+    return keys
+
+
+def download_one_by_one(s3_handler: S3Handler, keys: list[str], local_dir: Path):
+    for key in keys:
+        if key in s3_handler.list_files(key):
+            s3_handler.download_file(key, local_dir)
+
+
+def measure(name, function, *args) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(*args)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<40}{elapsed:>10.2f}s')
+    return elapsed
+
+
+def main():
+    with mock_aws():
+        client = boto3.client('s3', region_name=REGION)
+        keys = seed(client)
+        s3_handler = S3Handler(None, None, REGION, BUCKET)
+        total_bytes = SMALL_FILES * SMALL_FILE_SIZE + LARGE_FILES * LARGE_FILE_SIZE
+        print(f'Seeded {len(keys)} objects ({total_bytes / 1024 / 1024:.0f} MiB) in moto bucket "{BUCKET}"')
+        with tempfile.TemporaryDirectory() as serial_dir, tempfile.TemporaryDirectory() as bulk_dir:
+            serial = measure('listing per file, serial downloads', download_one_by_one, s3_handler, keys,
+                             Path(serial_dir))
+            bulk = measure('bulk download, cold', s3_handler.download_files, keys, bulk_dir, True)
+            measure('bulk download, warm cache', s3_handler.download_files, keys, bulk_dir, True)
+            print(f'Throughput: serial {total_bytes / serial / 1024 / 1024:.1f} MiB/s, '
+                  f'bulk {total_bytes / bulk / 1024 / 1024:.1f} MiB/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+from src.database.record_database import RecordDatabase
+
+
+def main():
+    record_db = RecordDatabase('record')
+    record_db.bootstrap()
+    applied = record_db.migrate()
+    if applied:
+        print(f'Applied record database migrations: {", ".join(str(version) for version in applied)}')
+    else:
+        print('Record database is up to date')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,23 @@
 import json
-import re
 import time
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 import requests
 
+from src.api.rate_limiter import get_retry_delay, rate_limiter
 from src.api.response import Response
+from src.api.sse import iter_sse_events
+from src.api.session_pool import session_pool
 
 
 class Api(object):
-    def __init__(self, base_url: str, secret_header: Optional[dict[str, Any]] = None):
+    def __init__(self, base_url: str, secret_header: Optional[dict[str, Any]] = None,
+                 session: Optional[requests.Session] = None, env: Optional[str] = None):
         self.base_url = base_url
+        self.env = env or 'default'
         self.secret_header = secret_header or {}
+        self.session = session or session_pool.get_session(base_url)
 
     def request(self, method: str, endpoint: str, **kwargs: dict[str, Any]) -> Response:
         url = f'{self.base_url}/{endpoint}'
@@ -20,38 +25,47 @@ class Api(object):
         sleep_rate = kwargs.pop('sleep_rate', 1.0)
 
         for attempt in range(max_attempt):
-            sleep_time = sleep_rate * (2 ** attempt)
+            rate_limiter.acquire(self.env, endpoint)
             response = None
 
             try:
-                response = requests.request(method, url, **kwargs)
+                response = self.session.request(method, url, **kwargs)
                 response.raise_for_status()
                 return self._process_response(response, kwargs)
             except requests.exceptions.HTTPError as e:
-                if response:
+                if response is not None:
                     print(f'HTTP error occurred with status code {response.status_code}: {e}')
                 else:
                     print(f'HTTP error occurred with no response: {e}')
             except requests.exceptions.RequestException as e:
                 print(f'Request exception occurred: {e}')
-            finally:
+
+            if attempt < max_attempt - 1:
+                sleep_time = get_retry_delay(
+                    None if response is None else response.status_code,
+                    {} if response is None else response.headers,
+                    sleep_rate * (2 ** attempt)
+                )
+                if response is not None and response.status_code == 429:
+                    rate_limiter.pause(self.env, endpoint, sleep_time)
                 time.sleep(sleep_time)
 
-            if attempt == max_attempt - 1:
-                print(f'Failed to get API response at {url} after {max_attempt} attempts')
-                return Response(None, None)
+        print(f'Failed to get API response at {url} after {max_attempt} attempts')
+        return Response(None, None)
 
     def _process_response(self, response: requests.Response, kwargs: dict[str, Any]) -> Response:
         if kwargs.get('stream', False):
-            events = [
-                json.loads(match.group(1))
-                for line in response.iter_lines()
-                for line_str in [line.strip().decode('utf-8')]
-                if line_str and (match := re.search(r'\w+: (\{.*})', line_str))
-            ]
-            return Response(response.status_code, events)
+            return Response(response.status_code, self._iter_events(response))
+        if response.status_code == 204 or not response.content:
+            return Response(response.status_code, None)
         return Response(response.status_code, response.json())
 
+    def _iter_events(self, response: requests.Response) -> Iterator[dict[str, Any]]:
+        try:
+            yield from iter_sse_events(response.iter_lines(chunk_size=None))
+        finally:
+            response.close()
+
     def _merge_headers(self, headers: Optional[dict[str, str]] = None) -> dict[str, str]:
         headers = headers or {}
         headers.update(self.secret_header)
@@ -1,10 +1,11 @@
 import json
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 
 from src.api.api import Api
 
 
-class AppApi(Api):
+class AppApiMixin(object):
     SUPPORTED_MIME_TYPE = {
         'png': 'image/png',
         'jpeg': 'image/jpeg',
@@ -13,13 +14,8 @@ class AppApi(Api):
         'gif': 'image/gif'
     }
 
-    def __init__(self, url, secret_key):
-        super(AppApi, self).__init__(base_url=url, secret_header={'Authorization': f'Bearer {secret_key}'})
-
-    def send_query(self, user_input, streaming_mode: bool, session_id: str, user: str, files: list = None,
-                   max_attempt=3, sleep_rate=1):
-        headers = {'Content-Type': 'application/json'}
-        payload = {
+    def _build_query_payload(self, user_input, streaming_mode: bool, session_id: str, user: str, files: list = None):
+        return {
             'inputs': {},
             'query': user_input,
             'response_mode': 'streaming' if streaming_mode else 'blocking',
@@ -28,45 +24,52 @@ class AppApi(Api):
             'files': files if files is not None else []
         }
 
-        response = self.post(
-            endpoint='chat-messages',
-            headers=headers,
-            data=payload,
-            stream=streaming_mode,
-            max_attempt=max_attempt,
-            sleep_rate=sleep_rate
-        )
-        if response.data:
-            return self._process_response_data(response.data, streaming_mode)
+    def _get_mime_type(self, file_path: Path) -> str:
+        file_extension = file_path.suffix.lower().lstrip('.')
+        mime_type = self.SUPPORTED_MIME_TYPE.get(file_extension)
+        if mime_type is None:
+            supported_extensions = ', '.join(f'"{ext}"' for ext in self.SUPPORTED_MIME_TYPE.keys())
+            print(supported_extensions)
+            raise ValueError(
+                f'Unsupported file extension: "{file_extension}", only {supported_extensions} are supported'
+            )
+        return mime_type
 
     def _process_response_data(self, response_data, streaming_mode):
-        if streaming_mode and isinstance(response_data, list):
-            return self._handle_streaming_response(response_data)
+        if streaming_mode and not isinstance(response_data, dict):
+            return self.handle_streaming_events(response_data)
         elif not streaming_mode and isinstance(response_data, dict):
             if self._is_response_error(response_data):
                 return None
             return response_data
         return None
 
-    def _handle_streaming_response(self, response_data):
+    def handle_streaming_events(self, events: Iterable[dict]):
         final_message = None
         answers = []
         metadata = None
 
-        for item in response_data:
-            if self._is_response_error(item):
-                return None
-            event = item.get('event', '')
-            if event.endswith('thought'):
-                continue
-            if event.endswith('message'):
-                if final_message is None:
-                    final_message = item
-                answers.append(item.get('answer', ''))
-            elif event.endswith('message_end'):
-                metadata = item.get('metadata', {})
-            else:
-                raise ValueError(f'Unexpected event type: {event}')
+        try:
+            for item in events:
+                event = item.get('event', '')
+                if event == 'error':
+                    print(f'Streaming response failed with {item.get("code", "")}: {item.get("message", "")}')
+                    return None
+                if event.endswith('thought'):
+                    continue
+                if event.endswith('message'):
+                    if final_message is None:
+                        final_message = item
+                    answers.append(item.get('answer', ''))
+                elif event.endswith('message_end'):
+                    metadata = item.get('metadata', {})
+                    break
+                else:
+                    raise ValueError(f'Unexpected event type: {event}')
+        finally:
+            close = getattr(events, 'close', None)
+            if close is not None:
+                close()
 
         filtered_answers = [answer for answer in answers if answer.strip()]
         if filtered_answers and metadata is not None:
@@ -85,15 +88,46 @@ class AppApi(Api):
                 print(f'Failed to parse error message: {e}')
         return False
 
+
+class AppApi(AppApiMixin, Api):
+    def __init__(self, url, secret_key, env=None):
+        super(AppApi, self).__init__(
+            base_url=url, secret_header={'Authorization': f'Bearer {secret_key}'}, env=env
+        )
+
+    def send_query(self, user_input, streaming_mode: bool, session_id: str, user: str, files: list = None,
+                   max_attempt=3, sleep_rate=1):
+        headers = {'Content-Type': 'application/json'}
+        payload = self._build_query_payload(user_input, streaming_mode, session_id, user, files)
+
+        response = self.post(
+            endpoint='chat-messages',
+            headers=headers,
+            data=payload,
+            stream=streaming_mode,
+            max_attempt=max_attempt,
+            sleep_rate=sleep_rate
+        )
+        if response.data:
+            return self._process_response_data(response.data, streaming_mode)
+
+    def stream_query(self, user_input, session_id: str, user: str, files: list = None,
+                     max_attempt=3, sleep_rate=1) -> Optional[Iterator[dict]]:
+        headers = {'Content-Type': 'application/json'}
+        payload = self._build_query_payload(user_input, True, session_id, user, files)
+
+        response = self.post(
+            endpoint='chat-messages',
+            headers=headers,
+            data=payload,
+            stream=True,
+            max_attempt=max_attempt,
+            sleep_rate=sleep_rate
+        )
+        return response.data
+
     def upload_file(self, file_path: Path, user: str) -> str:
-        file_extension = file_path.suffix.lower().lstrip('.')
-        mime_type = self.SUPPORTED_MIME_TYPE.get(file_extension)
-        if mime_type is None:
-            supported_extensions = ', '.join(f'"{ext}"' for ext in self.SUPPORTED_MIME_TYPE.keys())
-            print(supported_extensions)
-            raise ValueError(
-                f'Unsupported file extension: "{file_extension}", only {supported_extensions} are supported'
-            )
+        mime_type = self._get_mime_type(file_path)
 
         data = {
             'user': user
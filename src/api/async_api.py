@@ -0,0 +1,198 @@
+import asyncio
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from src.api.rate_limiter import get_retry_delay, rate_limiter
+from src.api.response import Response
+from src.api.sse import aiter_sse_events
+from src.utils.config import config
+
+
+class AsyncSessionPool(object):
+    def __init__(self):
+        self._sessions = {}
+        self._references = defaultdict(int)
+
+    @staticmethod
+    def _get_origin(base_url: str) -> str:
+        parts = urlsplit(base_url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    def get_session(self, base_url: str) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        loop_sessions = self._sessions.setdefault(loop, {})
+        origin = self._get_origin(base_url)
+        session = loop_sessions.get(origin)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.api_async_max_concurrency,
+                limit_per_host=config.api_async_limit_per_host
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            loop_sessions[origin] = session
+        return session
+
+    def acquire(self, base_url: str) -> aiohttp.ClientSession:
+        session = self.get_session(base_url)
+        self._references[(asyncio.get_running_loop(), self._get_origin(base_url))] += 1
+        return session
+
+    async def release(self, base_url: str) -> bool:
+        loop = asyncio.get_running_loop()
+        origin = self._get_origin(base_url)
+        self._references[(loop, origin)] -= 1
+        if self._references[(loop, origin)] > 0:
+            return False
+        del self._references[(loop, origin)]
+        loop_sessions = self._sessions.get(loop, {})
+        session = loop_sessions.pop(origin, None)
+        if not loop_sessions:
+            self._sessions.pop(loop, None)
+        if session is not None:
+            await session.close()
+        return True
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        for origin in list(self._sessions.get(loop, {})):
+            self._references.pop((loop, origin), None)
+        for session in self._sessions.pop(loop, {}).values():
+            await session.close()
+
+
+async_session_pool = AsyncSessionPool()
+
+
+class AsyncApi(object):
+    def __init__(self, base_url: str, secret_header: Optional[dict[str, Any]] = None, env: Optional[str] = None,
+                 max_concurrency: Optional[int] = None):
+        self.base_url = base_url
+        self.secret_header = secret_header or {}
+        self.env = env or 'default'
+        self.max_concurrency = max_concurrency or config.api_async_max_concurrency
+        self._semaphores = {}
+
+    async def __aenter__(self):
+        async_session_pool.acquire(self.base_url)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if await async_session_pool.release(self.base_url):
+            self._semaphores.pop(asyncio.get_running_loop(), None)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def request(self, method: str, endpoint: str, **kwargs: dict[str, Any]) -> Response:
+        url = f'{self.base_url}/{endpoint}'
+        max_attempt = kwargs.pop('max_attempt', 1)
+        sleep_rate = kwargs.pop('sleep_rate', 1.0)
+        stream = kwargs.pop('stream', False)
+        session = async_session_pool.get_session(self.base_url)
+
+        for attempt in range(max_attempt):
+            wait = rate_limiter.get_bucket(self.env, endpoint).reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            status_code = None
+            headers = {}
+
+            try:
+                async with self._get_semaphore():
+                    async with session.request(method, url, **self._prepare_request(kwargs)) as response:
+                        status_code = response.status
+                        headers = response.headers
+                        response.raise_for_status()
+                        return await self._process_response(response, stream)
+            except aiohttp.ClientResponseError as e:
+                print(f'HTTP error occurred with status code {e.status}: {e.message} for url: {url}')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f'Request exception occurred: {e!r}')
+
+            if attempt < max_attempt - 1:
+                sleep_time = get_retry_delay(status_code, headers, sleep_rate * (2 ** attempt))
+                if status_code == 429:
+                    rate_limiter.pause(self.env, endpoint, sleep_time)
+                await asyncio.sleep(sleep_time)
+
+        print(f'Failed to get API response at {url} after {max_attempt} attempts')
+        return Response(None, None)
+
+    async def _process_response(self, response: aiohttp.ClientResponse, stream: bool) -> Response:
+        if stream:
+            return Response(response.status, [event async for event in aiter_sse_events(response.content)])
+        return Response(response.status, await response.json(content_type=None))
+
+    def _prepare_request(self, kwargs: dict[str, Any]) -> dict[str, Any]:
+        kwargs = dict(kwargs)
+        files = kwargs.pop('files', None)
+        if files is None:
+            return kwargs
+
+        form = aiohttp.FormData()
+        for name, value in (kwargs.pop('data', None) or {}).items():
+            form.add_field(name, value if isinstance(value, str) else json.dumps(value))
+        for name, file_part in files.items():
+            filename, content = file_part[0], file_part[1]
+            content_type = file_part[2] if len(file_part) > 2 else None
+            if isinstance(content, Path):
+                content = content.read_bytes()
+            form.add_field(name, content, filename=filename, content_type=content_type)
+        kwargs['data'] = form
+        return kwargs
+
+    def _merge_headers(self, headers: Optional[dict[str, str]] = None) -> dict[str, str]:
+        headers = headers or {}
+        headers.update(self.secret_header)
+        return headers
+
+    def _prepare_data(self, **kwargs: dict[str, Any]) -> dict[str, Any]:
+        data = kwargs.pop('data', None)
+        raw_file_path = kwargs.pop('file_path', None)
+
+        if data is not None and raw_file_path is not None:
+            if not isinstance(raw_file_path, (str, Path)):
+                raise TypeError(f'file_path must be a string or Path-like object, not {type(raw_file_path).__name__}')
+            file_path = Path(raw_file_path)
+            kwargs['files'] = {
+                'data': (None, json.dumps(data), 'text/plain'),
+                'file': (file_path.name, file_path)
+            }
+            if 'headers' in kwargs:
+                kwargs['headers'].pop('Content-Type', None)
+        elif data is not None:
+            headers = kwargs.get('headers', {})
+            if headers.get('Content-Type') == 'application/json':
+                kwargs['json'] = data
+            else:
+                kwargs['data'] = data
+
+        return kwargs
+
+    async def get(self, endpoint: str, **kwargs) -> Response:
+        kwargs.update(headers=self._merge_headers(kwargs.get('headers')))
+        return await self.request('GET', endpoint, **kwargs)
+
+    async def post(self, endpoint: str, **kwargs) -> Response:
+        kwargs.update(headers=self._merge_headers(kwargs.get('headers')))
+        kwargs = self._prepare_data(**kwargs)
+        return await self.request('POST', endpoint, **kwargs)
+
+    async def put(self, endpoint, **kwargs) -> Response:
+        kwargs.update(headers=self._merge_headers(kwargs.get('headers')))
+        kwargs = self._prepare_data(**kwargs)
+        return await self.request('PUT', endpoint, **kwargs)
+
+    async def delete(self, endpoint, **kwargs) -> Response:
+        kwargs.update(headers=self._merge_headers(kwargs.get('headers')))
+        return await self.request('DELETE', endpoint, **kwargs)
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from src.api.app_api import AppApiMixin
+from src.api.async_api import AsyncApi
+
+
+class AsyncAppApi(AppApiMixin, AsyncApi):
+    def __init__(self, url, secret_key, env=None, max_concurrency=None):
+        super(AsyncAppApi, self).__init__(
+            base_url=url, secret_header={'Authorization': f'Bearer {secret_key}'}, env=env,
+            max_concurrency=max_concurrency
+        )
+
+    async def send_query(self, user_input, streaming_mode: bool, session_id: str, user: str, files: list = None,
+                         max_attempt=3, sleep_rate=1):
+        headers = {'Content-Type': 'application/json'}
+        payload = self._build_query_payload(user_input, streaming_mode, session_id, user, files)
+
+        response = await self.post(
+            endpoint='chat-messages',
+            headers=headers,
+            data=payload,
+            stream=streaming_mode,
+            max_attempt=max_attempt,
+            sleep_rate=sleep_rate
+        )
+        if response.data:
+            return self._process_response_data(response.data, streaming_mode)
+
+    async def upload_file(self, file_path: Path, user: str) -> str:
+        mime_type = self._get_mime_type(file_path)
+
+        data = {
+            'user': user
+        }
+        files = {
+            'file': (file_path.name, file_path, mime_type)
+        }
+        response = await self.post(
+            endpoint='files/upload', files=files, data=data
+        )
+        return (response.data or {}).get('id', '')
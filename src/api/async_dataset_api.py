@@ -0,0 +1,127 @@
+import asyncio
+import math
+from typing import Optional
+
+from urllib3.exceptions import ConnectTimeoutError
+
+from src.api.async_api import AsyncApi
+from src.api.dataset_api import DatasetApi
+
+
+class AsyncDatasetApi(AsyncApi):
+    def __init__(self, url, secret_key, env=None, max_concurrency=None):
+        super(AsyncDatasetApi, self).__init__(
+            base_url=url, secret_header={'Authorization': f'Bearer {secret_key}'}, env=env,
+            max_concurrency=max_concurrency
+        )
+
+    async def _get_all_pages(self, endpoint, limit, max_attempt=3, headers=None) -> list:
+        async def get_page(page):
+            response = await self.get(
+                endpoint, headers=dict(headers or {}), params={'page': page, 'limit': limit}, max_attempt=max_attempt
+            )
+            if response.data is None:
+                raise ConnectTimeoutError(f'Failed to get {endpoint} in {self.base_url}')
+            return response.data
+
+        data = await get_page(1)
+        items = list(data.get('data', []))
+        if not data.get('has_more', False):
+            return items
+
+        total = data.get('total')
+        if total is None:
+            page = 2
+            while True:
+                data = await get_page(page)
+                items.extend(data.get('data', []))
+                if not data.get('has_more', False):
+                    return items
+                page += 1
+
+        pages = await asyncio.gather(*(get_page(page) for page in range(2, math.ceil(total / limit) + 1)))
+        for data in pages:
+            items.extend(data.get('data', []))
+        return items
+
+    async def get_datasets(self, limit=20):
+        return await self._get_all_pages('datasets', limit)
+
+    async def get_documents_in_dataset(self, dataset_id, is_enabled: bool = None, limit=100):
+        documents = await self._get_all_pages(f'datasets/{dataset_id}/documents', limit)
+        return DatasetApi._filter_documents(documents, is_enabled)
+
+    async def create_document(self, dataset_id, document_name, max_retry=3, backoff_factor=1):
+        headers = {'Content-Type': 'application/json'}
+        data = DatasetApi._build_document_payload(document_name)
+        for retry in range(max_retry):
+            response = await self.post(f'datasets/{dataset_id}/document/create_by_text', headers=headers, data=data)
+            if response.data is not None:
+                try:
+                    return response.data['document']['id'], response.data['batch']
+                except KeyError:
+                    raise ValueError(
+                        f'Unexpected response when creating document with name {document_name}: {response}')
+            elif retry < max_retry - 1:
+                await asyncio.sleep(backoff_factor * (2 ** retry))
+        raise ConnectTimeoutError(f'Failed to create document with name {document_name}')
+
+    async def delete_document(self, dataset_id, document_id):
+        try:
+            response = await self.delete(f'datasets/{dataset_id}/documents/{document_id}')
+            return f'{document_id} is deleted: {response.data["result"]}'
+        except TypeError as e:
+            return f'{document_id} has failed to delete: {e}'
+
+    async def get_segments_from_document(self, dataset_id, document_id, max_attempt=3, limit=100):
+        headers = {'Content-Type': 'application/json'}
+        endpoint = f'datasets/{dataset_id}/documents/{document_id}/segments'
+        segments = await self._get_all_pages(endpoint, limit, max_attempt, headers)
+        segments_list = DatasetApi._filter_segments(segments)
+        return sorted(segments_list, key=lambda segment: segment['position'])
+
+    async def create_segment_in_document(self, dataset_id, document_id, segment: dict) -> str:
+        headers = {'Content-Type': 'application/json'}
+        endpoint = f'datasets/{dataset_id}/documents/{document_id}/segments'
+        data = DatasetApi._build_segments_payload([segment])
+        response = await self.post(endpoint, headers=headers, data=data, max_attempt=3)
+        return response.data.get('data', [''])[0].get('id', '')
+
+    async def create_segments_in_document(self, dataset_id, document_id, segments: list[dict], max_batch_size=None,
+                                          max_batch_bytes=None) -> list[str]:
+        headers = {'Content-Type': 'application/json'}
+        endpoint = f'datasets/{dataset_id}/documents/{document_id}/segments'
+        segment_ids = []
+        for batch in DatasetApi._split_segment_batches(segments, max_batch_size, max_batch_bytes):
+            data = DatasetApi._build_segments_payload(batch)
+            response = await self.post(endpoint, headers=headers, data=data, max_attempt=3)
+            segment_ids.extend(DatasetApi._get_created_segment_ids(response.data, batch, document_id))
+        return segment_ids
+
+    async def create_document_by_file(self, dataset_id, file_path, separator='\n', max_tokens=1000):
+        endpoint = f'datasets/{dataset_id}/document/create_by_file'
+        data = DatasetApi._build_file_payload(separator, max_tokens)
+        return await self.post(endpoint, data=data, file_path=file_path)
+
+    async def update_segment_in_document(self, dataset_id, document_id, segment_id, content,
+                                         answer=None, keywords: list = None, enabled=None):
+        headers = {'Content-Type': 'application/json'}
+        endpoint = f'datasets/{dataset_id}/documents/{document_id}/segments/{segment_id}'
+        data = DatasetApi._build_segment_update_payload(content, answer, keywords, enabled)
+        return await self.post(endpoint, headers=headers, data=data)
+
+    async def update_segments_in_document(self, dataset_id, document_id, segments: list[dict]):
+        return await asyncio.gather(*(
+            self.update_segment_in_document(
+                dataset_id, document_id, segment['id'], segment.get('content'), segment.get('answer'),
+                segment.get('keywords'), segment.get('enabled')
+            ) for segment in segments
+        ))
+
+    async def get_indexing_status(self, dataset_id, batch_id) -> Optional[dict[str, str]]:
+        endpoint = f'datasets/{dataset_id}/documents/{batch_id}/indexing-status'
+        response = await self.get(endpoint)
+        return DatasetApi._parse_indexing_status(response.data)
+
+    async def get_document_embedding_status(self, dataset_id, batch_id, document_id):
+        return (await self.get_indexing_status(dataset_id, batch_id) or {}).get(document_id, '')
@@ -1,58 +1,113 @@
+import json
+import math
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
 
 from urllib3.exceptions import ConnectTimeoutError
 
 from src.api.api import Api
+from src.utils.config import config
 
 
 class DatasetApi(Api):
-    def __init__(self, url, secret_key):
-        super(DatasetApi, self).__init__(base_url=url, secret_header={'Authorization': f'Bearer {secret_key}'})
+    DOCUMENT_KEYS = ['id', 'position', 'name', 'enabled']
+    SEGMENT_KEYS = ['id', 'position', 'document_id', 'content', 'answer', 'keywords', 'enabled']
 
-    def get_datasets(self, limit=20, **kwargs):
-        page = 1
-        datasets = []
+    def __init__(self, url, secret_key, env=None):
+        super(DatasetApi, self).__init__(
+            base_url=url, secret_header={'Authorization': f'Bearer {secret_key}'}, env=env
+        )
 
-        while True:
-            response = self.get('datasets', params={'page': page, 'limit': limit}, **kwargs)
+    def _iter_pages(self, endpoint, limit, max_workers=None, **kwargs) -> Iterator[list]:
+        params = dict(kwargs.pop('params', None) or {})
 
+        def fetch_page(page, page_limit):
+            response = self.get(endpoint, params={**params, 'page': page, 'limit': page_limit}, **kwargs)
             if response.data is None:
-                raise ConnectTimeoutError(f'Failed to get datasets info in {self.base_url}')
-            datasets.extend(response.data.get('data'))
-            if not response.data.get('has_more', False):
-                break
-            page += 1
+                raise ConnectTimeoutError(f'Failed to get page {page} of {endpoint} in {self.base_url}')
+            return response.data
+
+        first_page = fetch_page(1, limit)
+        yield first_page.get('data') or []
+        if not first_page.get('has_more', False):
+            return
+
+        limit = first_page.get('limit') or limit
+        total = first_page.get('total')
+        max_workers = max_workers or config.api_pagination_max_workers
+        if total is None or max_workers <= 1:
+            page = 2
+            while True:
+                page_data = fetch_page(page, limit)
+                yield page_data.get('data') or []
+                if not page_data.get('has_more', False):
+                    return
+                page += 1
 
-        return datasets
+        last_page = math.ceil(total / limit)
+        executor = ThreadPoolExecutor(max_workers=max(min(max_workers, last_page - 1), 1))
+        try:
+            futures = [executor.submit(fetch_page, page, limit) for page in range(2, last_page + 1)]
+            for future in futures:
+                yield future.result().get('data') or []
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_datasets(self, limit=20, max_workers=None, **kwargs) -> Iterator[dict]:
+        for datasets in self._iter_pages('datasets', limit, max_workers, **kwargs):
+            yield from datasets
+
+    def get_datasets(self, limit=20, **kwargs):
+        return list(self.iter_datasets(limit, **kwargs))
+
+    def iter_documents_in_dataset(self, dataset_id, is_enabled: bool = None, limit=100, max_attempt=3,
+                                  max_workers=None) -> Iterator[dict]:
+        endpoint = f'datasets/{dataset_id}/documents'
+        for documents in self._iter_pages(endpoint, limit, max_workers, max_attempt=max_attempt):
+            yield from self._filter_documents(documents, is_enabled)
 
     def get_documents_in_dataset(self, dataset_id, is_enabled: bool = None, limit=100, max_attempt=3):
-        def fetch_documents_page(dataset_id, page, limit):
-            endpoint = f'datasets/{dataset_id}/documents'
-            params = {'page': page, 'limit': limit}
-            return self.get(endpoint, params=params, max_attempt=max_attempt)
-
-        def filter_documents(documents, is_enabled):
-            keys = ['id', 'position', 'name', 'enabled']
-            if is_enabled is None:
-                return [{key: item[key] for key in keys} for item in documents]
-            return [{key: item[key] for key in keys} for item in documents if item['enabled'] == is_enabled]
-
-        page = 1
-        has_more = True
-        all_documents = []
-
-        while has_more:
-            response = fetch_documents_page(dataset_id, page, limit)
-            filtered_documents = filter_documents(response.data.get('data'), is_enabled)
-            all_documents.extend(filtered_documents)
-            has_more = response.data.get('has_more')
-            page += 1
-
-        return all_documents
+        return list(self.iter_documents_in_dataset(dataset_id, is_enabled, limit, max_attempt))
 
-    def create_document(self, dataset_id, document_name, max_retry=3, backoff_factor=1):
-        headers = {'Content-Type': 'application/json'}
-        data = {
+    def get_document(self, dataset_id, document_id, max_attempt=3) -> Optional[dict]:
+        response = self.get(f'datasets/{dataset_id}/documents/{document_id}', max_attempt=max_attempt)
+        if response.data is None or 'id' not in response.data:
+            print(f'Failed to get document {document_id} in dataset {dataset_id}: {response.data}')
+            return None
+        return {key: response.data.get(key) for key in self.DOCUMENT_KEYS}
+
+    def get_documents(self, dataset_id, document_ids: list[str], is_enabled: bool = None,
+                      max_in_flight=None) -> list[dict]:
+        max_in_flight = max_in_flight or config.api_documents_max_in_flight
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            documents = list(executor.map(lambda document_id: self.get_document(dataset_id, document_id), document_ids))
+        failed = sum(document is None for document in documents)
+        if document_ids and failed == len(document_ids):
+            raise ConnectTimeoutError(
+                f'Failed to get any of {failed} documents in dataset {dataset_id}, '
+                f'check that {self.base_url} supports datasets/{{dataset_id}}/documents/{{document_id}}')
+        if failed:
+            print(f'Failed to get {failed} of {len(document_ids)} documents in dataset {dataset_id}')
+        return [
+            document for document in documents
+            if document is not None and (is_enabled is None or document['enabled'] == is_enabled)
+        ]
+
+    @classmethod
+    def _filter_documents(cls, documents, is_enabled):
+        if is_enabled is None:
+            return [{key: item[key] for key in cls.DOCUMENT_KEYS} for item in documents]
+        return [{key: item[key] for key in cls.DOCUMENT_KEYS} for item in documents if item['enabled'] == is_enabled]
+
+    @classmethod
+    def _filter_segments(cls, segments):
+        return [{key: segment[key] for key in cls.SEGMENT_KEYS} for segment in segments]
+
+    @staticmethod
+    def _build_document_payload(document_name):
+        return {
             'name': document_name,
             'text': '',
             'indexing_technique': 'high_quality',
@@ -60,6 +115,87 @@ class DatasetApi(Api):
                 'mode': 'automatic'
             }
         }
+
+    @staticmethod
+    def _build_segment_payload(segment: dict):
+        return {
+            'content': segment.get('content'),
+            'answer': segment.get('answer', ''),
+            'keywords': segment.get('keywords', [])
+        }
+
+    @classmethod
+    def _build_segments_payload(cls, segments: list[dict]):
+        return {
+            'segments': [cls._build_segment_payload(segment) for segment in segments]
+        }
+
+    @classmethod
+    def _split_segment_batches(cls, segments: list[dict], max_batch_size=None, max_batch_bytes=None) -> list[list]:
+        max_batch_size = max_batch_size or config.api_segments_batch_size
+        max_batch_bytes = max_batch_bytes or config.api_segments_batch_bytes
+        batches = []
+        batch = []
+        batch_bytes = 0
+        for segment in segments:
+            segment_bytes = len(json.dumps(cls._build_segment_payload(segment), ensure_ascii=False).encode('utf-8'))
+            if batch and (len(batch) >= max_batch_size or batch_bytes + segment_bytes > max_batch_bytes):
+                batches.append(batch)
+                batch = []
+                batch_bytes = 0
+            batch.append(segment)
+            batch_bytes += segment_bytes
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def _get_created_segment_ids(response_data, batch: list[dict], document_id) -> list[str]:
+        created_segments = (response_data or {}).get('data') or []
+        if len(created_segments) != len(batch):
+            raise ValueError(
+                f'Expected {len(batch)} segments to be created in document {document_id}, got {len(created_segments)}'
+            )
+        created_segments = sorted(created_segments, key=lambda segment: segment.get('position', 0))
+        return [segment.get('id', '') for segment in created_segments]
+
+    @staticmethod
+    def _build_file_payload(separator, max_tokens):
+        return {
+            'indexing_technique': 'high_quality',
+            'process_rule': {
+                'rules': {
+                    'pre_processing_rules': [
+                        {'id': 'remove_extra_spaces', 'enabled': True}, {'id': 'remove_urls_emails', 'enabled': False}
+                    ],
+                    'segmentation': {'separator': separator, 'max_tokens': max_tokens}
+                },
+                'mode': 'custom'
+            }
+        }
+
+    @staticmethod
+    def _build_segment_update_payload(content, answer=None, keywords: list = None, enabled=None):
+        data = {
+            'segment': {'content': content}
+        }
+        if answer is not None:
+            data['segment']['answer'] = answer
+        if keywords is not None:
+            data['segment']['keywords'] = keywords
+        if enabled is not None:
+            data['segment']['enabled'] = enabled
+        return data
+
+    @staticmethod
+    def _parse_indexing_status(response_data) -> Optional[dict[str, str]]:
+        if response_data is None or 'data' not in response_data:
+            return None
+        return {item['id']: item.get('indexing_status', '') for item in response_data['data'] if 'id' in item}
+
+    def create_document(self, dataset_id, document_name, max_retry=3, backoff_factor=1):
+        headers = {'Content-Type': 'application/json'}
+        data = self._build_document_payload(document_name)
         for retry in range(max_retry):
             response = self.post(f'datasets/{dataset_id}/document/create_by_text', headers=headers, data=data)
             if response.data is not None:
@@ -81,43 +217,58 @@ class DatasetApi(Api):
         except TypeError as e:
             return f'{document_id} has failed to delete: {e}'
 
-    def get_segments_from_document(self, dataset_id, document_id, max_attempt=3):
+    def iter_segments_from_document(self, dataset_id, document_id, limit=100, max_attempt=3,
+                                    max_workers=None) -> Iterator[dict]:
         headers = {'Content-Type': 'application/json'}
         endpoint = f'datasets/{dataset_id}/documents/{document_id}/segments'
-        response = self.get(endpoint, headers=headers, max_attempt=max_attempt)
-        segments = response.data.get('data')
-        keys = ['id', 'position', 'document_id', 'content', 'answer', 'keywords', 'enabled']
-        segments_list = [{key: segment[key] for key in keys} for segment in segments]
+        for segments in self._iter_pages(endpoint, limit, max_workers, headers=headers, max_attempt=max_attempt):
+            yield from self._filter_segments(segments)
+
+    def get_segments_from_document(self, dataset_id, document_id, max_attempt=3, limit=100, max_workers=None):
+        segments_list = list(self.iter_segments_from_document(dataset_id, document_id, limit, max_attempt, max_workers))
         return sorted(segments_list, key=lambda segment: segment['position'])
 
+    def iter_segments_from_documents(self, dataset_id, document_ids: Iterable[str], max_in_flight=None, limit=100,
+                                     max_attempt=3) -> Iterator[tuple[str, list[dict]]]:
+        max_in_flight = max_in_flight or config.api_segments_max_in_flight
+        executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        pending = deque()
+        try:
+            for document_id in document_ids:
+                future = executor.submit(
+                    self.get_segments_from_document, dataset_id, document_id, max_attempt, limit, 1
+                )
+                pending.append((document_id, future))
+                if len(pending) >= max_in_flight:
+                    document_id, future = pending.popleft()
+                    yield document_id, future.result()
+            while pending:
+                document_id, future = pending.popleft()
+                yield document_id, future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def create_segment_in_document(self, dataset_id, document_id, segment: dict) -> str:
         headers = {'Content-Type': 'application/json'}
         endpoint = f'datasets/{dataset_id}/documents/{document_id}/segments'
-        data = {
-            'segments': [
-                {'content': segment.get('content'),
-                 'answer': segment.get('answer', ''),
-                 'keywords': segment.get('keywords', [])
-                 }
-            ]
-        }
+        data = self._build_segments_payload([segment])
         response = self.post(endpoint, headers=headers, data=data, max_attempt=3)
         return response.data.get('data', [''])[0].get('id', '')
 
+    def create_segments_in_document(self, dataset_id, document_id, segments: list[dict], max_batch_size=None,
+                                    max_batch_bytes=None) -> list[str]:
+        headers = {'Content-Type': 'application/json'}
+        endpoint = f'datasets/{dataset_id}/documents/{document_id}/segments'
+        segment_ids = []
+        for batch in self._split_segment_batches(segments, max_batch_size, max_batch_bytes):
+            data = self._build_segments_payload(batch)
+            response = self.post(endpoint, headers=headers, data=data, max_attempt=3)
+            segment_ids.extend(self._get_created_segment_ids(response.data, batch, document_id))
+        return segment_ids
+
     def create_document_by_file(self, dataset_id, file_path, separator='\n', max_tokens=1000):
         endpoint = f'datasets/{dataset_id}/document/create_by_file'
-        data = {
-            'indexing_technique': 'high_quality',
-            'process_rule': {
-                'rules': {
-                    'pre_processing_rules': [
-                        {'id': 'remove_extra_spaces', 'enabled': True}, {'id': 'remove_urls_emails', 'enabled': False}
-                    ],
-                    'segmentation': {'separator': separator, 'max_tokens': max_tokens}
-                },
-                'mode': 'custom'
-            }
-        }
+        data = self._build_file_payload(separator, max_tokens)
         response = self.post(endpoint, data=data, file_path=file_path)
         return response
 
@@ -125,24 +276,31 @@ class DatasetApi(Api):
                                    answer=None, keywords: list = None, enabled=None):
         headers = {'Content-Type': 'application/json'}
         endpoint = f'datasets/{dataset_id}/documents/{document_id}/segments/{segment_id}'
-        data = {
-            'segment': {'content': content}
-        }
-        if answer is not None:
-            data['segment']['answer'] = answer
-        if keywords is not None:
-            data['segment']['keywords'] = keywords
-        if enabled is not None:
-            data['segment']['enabled'] = enabled
+        data = self._build_segment_update_payload(content, answer, keywords, enabled)
         response = self.post(endpoint, headers=headers, data=data)
         return response
 
-    def get_document_embedding_status(self, dataset_id, batch_id, document_id):
+    def update_segments_in_document(self, dataset_id, document_id, segments: list[dict], max_in_flight=None):
+        max_in_flight = max_in_flight or config.api_segments_max_in_flight
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            futures = [
+                executor.submit(
+                    self.update_segment_in_document, dataset_id, document_id, segment['id'], segment.get('content'),
+                    segment.get('answer'), segment.get('keywords'), segment.get('enabled')
+                ) for segment in segments
+            ]
+            return [future.result() for future in futures]
+
+    def delete_segment(self, dataset_id, document_id, segment_id):
+        response = self.delete(f'datasets/{dataset_id}/documents/{document_id}/segments/{segment_id}')
+        if response.status_code is None:
+            return f'{segment_id} has failed to delete'
+        return f'{segment_id} is deleted'
+
+    def get_indexing_status(self, dataset_id, batch_id) -> Optional[dict[str, str]]:
         endpoint = f'datasets/{dataset_id}/documents/{batch_id}/indexing-status'
         response = self.get(endpoint)
-        if response.data is not None and 'data' in response.data:
-            for item in response.data['data']:
-                if 'id' in item and item['id'] == document_id:
-                    if 'indexing_status' in item:
-                        return item['indexing_status']
-        return ''
+        return self._parse_indexing_status(response.data)
+
+    def get_document_embedding_status(self, dataset_id, batch_id, document_id):
+        return (self.get_indexing_status(dataset_id, batch_id) or {}).get(document_id, '')
@@ -0,0 +1,104 @@
+import datetime
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from src.utils.config import config
+
+
+class TokenBucket(object):
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            pause = max(self._paused_until - now, 0.0)
+            if self.rate <= 0:
+                return pause
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, pause)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter(object):
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(RateLimiter, cls).__new__(cls)
+                cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+    @staticmethod
+    def get_endpoint_family(endpoint: str) -> str:
+        endpoint = endpoint.strip('/')
+        if endpoint.startswith('chat-messages'):
+            return 'chat-messages'
+        if '/segments' in endpoint:
+            return 'segments'
+        if endpoint.startswith('datasets'):
+            return 'datasets'
+        return 'default'
+
+    def get_bucket(self, env: str, endpoint: str) -> TokenBucket:
+        key = (env.lower(), self.get_endpoint_family(endpoint))
+        with self._buckets_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate_limit_config = config.get_rate_limit_config(*key)
+                bucket = TokenBucket(rate_limit_config.rate, rate_limit_config.capacity)
+                self._buckets[key] = bucket
+            return bucket
+
+    def acquire(self, env: str, endpoint: str):
+        self.get_bucket(env, endpoint).acquire()
+
+    def pause(self, env: str, endpoint: str, seconds: float):
+        self.get_bucket(env, endpoint).pause(seconds)
+
+
+rate_limiter = RateLimiter()
+
+
+def get_retry_delay(status_code: Optional[int], headers, default_delay: float) -> float:
+    if status_code not in (429, 503):
+        return default_delay
+    retry_after = headers.get('Retry-After')
+    if not retry_after:
+        return default_delay
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return default_delay
+    return max((retry_at - datetime.datetime.now(tz=datetime.timezone.utc)).total_seconds(), 0.0)
@@ -0,0 +1,86 @@
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.config import config
+
+
+class SessionPool(object):
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(SessionPool, cls).__new__(cls)
+                cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    @staticmethod
+    def _get_origin(base_url: str) -> str:
+        parts = urlsplit(base_url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    def get_session(self, base_url: str, pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None,
+                    pool_block: Optional[bool] = None) -> requests.Session:
+        origin = self._get_origin(base_url)
+        with self._sessions_lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = self._create_session(
+                    pool_connections if pool_connections is not None else config.api_pool_connections,
+                    pool_maxsize if pool_maxsize is not None else config.api_pool_maxsize,
+                    pool_block if pool_block is not None else config.api_pool_block
+                )
+                self._sessions[origin] = session
+            return session
+
+    def _create_session(self, pool_connections: int, pool_maxsize: int, pool_block: bool) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get_stats(self) -> dict[str, dict[str, int]]:
+        stats = {}
+        with self._sessions_lock:
+            sessions = list(self._sessions.items())
+        for origin, session in sessions:
+            requests_count = 0
+            connections_count = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    requests_count += pool.num_requests
+                    connections_count += pool.num_connections
+            stats[origin] = {
+                'requests': requests_count,
+                'connections': connections_count,
+                'reused': max(requests_count - connections_count, 0)
+            }
+        return stats
+
+    def print_stats(self):
+        for origin, stats in self.get_stats().items():
+            print(f'{origin}: {stats["requests"]} requests over {stats["connections"]} connections '
+                  f'({stats["reused"]} reused)')
+
+    def close(self):
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+session_pool = SessionPool()
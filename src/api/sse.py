@@ -0,0 +1,56 @@
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Union
+
+
+class SseParser(object):
+    def __init__(self):
+        self._data_lines = []
+
+    def feed(self, line: Union[bytes, str]) -> Optional[dict[str, Any]]:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.rstrip('\r\n')
+        if not line:
+            return self.flush()
+        if line.startswith(':'):
+            return None
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'data':
+            self._data_lines.append(value)
+        return None
+
+    def flush(self) -> Optional[dict[str, Any]]:
+        if not self._data_lines:
+            return None
+        data = '\n'.join(self._data_lines)
+        self._data_lines = []
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError as e:
+            print(f'Failed to parse server-sent event data: {e}')
+            return None
+        return event if isinstance(event, dict) else None
+
+
+def iter_sse_events(lines: Iterable[Union[bytes, str]]) -> Iterator[dict[str, Any]]:
+    parser = SseParser()
+    for line in lines:
+        event = parser.feed(line)
+        if event is not None:
+            yield event
+    event = parser.flush()
+    if event is not None:
+        yield event
+
+
+async def aiter_sse_events(lines: AsyncIterable[Union[bytes, str]]) -> AsyncIterator[dict[str, Any]]:
+    parser = SseParser()
+    async for line in lines:
+        event = parser.feed(line)
+        if event is not None:
+            yield event
+    event = parser.flush()
+    if event is not None:
+        yield event
@@ -1,8 +1,14 @@
 import datetime
+import io
+import itertools
+import json
+import threading
 import uuid
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine, inspect, text, Table, MetaData
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text, Table, MetaData, column, select, JSON
+from sqlalchemy import table as sql_table
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import sessionmaker
 
@@ -17,37 +23,151 @@ def database_session(session):
         session.close()
 
 
+class SchemaCache(object):
+    def __init__(self):
+        self.tables = None
+        self.primary_keys = {}
+        self.column_types = {}
+
+
+_schema_caches = {}
+_engines = {}
+_session_factories = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(db_uri: str):
+    with _engines_lock:
+        if db_uri not in _engines:
+            _engines[db_uri] = create_engine(
+                db_uri,
+                echo=False,
+                pool_size=config.database_pool_size,
+                max_overflow=config.database_pool_max_overflow,
+                pool_pre_ping=config.database_pool_pre_ping,
+                pool_recycle=config.database_pool_recycle
+            )
+            _session_factories[db_uri] = sessionmaker(bind=_engines[db_uri])
+        return _engines[db_uri]
+
+
 class Database(object):
+    MAX_BIND_PARAMETERS = 32767
 
     def __init__(self, database_name: str):
         self.database_name = database_name
         self.db_uri = config.get_db_uri(database_name)
-        self.engine = self._create_engine()
-        self.session = self._create_session()
+        self.engine = get_engine(self.db_uri)
+
+    @property
+    def session(self):
+        return _session_factories[self.db_uri]()
 
-    def _create_engine(self):
-        return create_engine(self.db_uri, echo=False)
+    @property
+    def schema(self) -> SchemaCache:
+        return _schema_caches.setdefault(self.db_uri, SchemaCache())
 
-    def _create_session(self):
-        Session = sessionmaker(bind=self.engine)
-        return Session()
+    def _get_table_names(self) -> set:
+        if self.schema.tables is None:
+            self.schema.tables = set(inspect(self.engine).get_table_names())
+        return self.schema.tables
 
     def create_table_if_not_exists(self, table):
-        inspector = inspect(self.session.bind)
-        if not inspector.has_table(table.__tablename__):
-            table.__table__.create(self.session.bind, checkfirst=True)
+        table_names = self._get_table_names()
+        if table.__tablename__ not in table_names:
+            table.__table__.create(self.engine, checkfirst=True)
+            table_names.add(table.__tablename__)
 
     def get_table_primary_key_column_names(self, table) -> list:
-        table = Table(table.__tablename__, MetaData(), autoload_with=self.engine)
-        if table.primary_key.columns.values():
-            return [col.name for col in table.primary_key.columns.values()]
-        else:
-            return []
+        primary_keys = self.schema.primary_keys
+        if table.__tablename__ not in primary_keys:
+            reflected_table = Table(table.__tablename__, MetaData(), autoload_with=self.engine)
+            primary_keys[table.__tablename__] = [col.name for col in reflected_table.primary_key.columns.values()]
+        return primary_keys[table.__tablename__]
 
     def get_column_types(self, table):
-        mapper = inspect(table)
-        column_types = {column.key: column.type for column in mapper.columns}
-        return column_types
+        column_types = self.schema.column_types
+        if table.__tablename__ not in column_types:
+            mapper = inspect(table)
+            column_types[table.__tablename__] = {column.key: column.type for column in mapper.columns}
+        return column_types[table.__tablename__]
+
+    def bootstrap(self, tables: list):
+        if self.schema.tables is not None and all(
+                table.__tablename__ in self.schema.primary_keys for table in tables):
+            return False
+        for table in tables:
+            self.create_table_if_not_exists(table)
+        inspector = inspect(self.engine)
+        for table in tables:
+            self.schema.primary_keys[table.__tablename__] = \
+                inspector.get_pk_constraint(table.__tablename__)['constrained_columns']
+            self.get_column_types(table)
+        return True
+
+    def upsert_records(self, session, table, records: list[dict], track_change=True, ignored_columns: list = None):
+        columns = set(table.__table__.columns.keys())
+        now = datetime.datetime.now(tz=datetime.timezone(datetime.timedelta(hours=8)))
+        pk_column_names = [column.name for column in table.__table__.primary_key.columns]
+        rows = {}
+        for record in records:
+            row = {key: value for key, value in record.items() if key in columns}
+            if track_change:
+                row.update(created_by='Created By Script', created_on=now, updated_by='Updated By Script', updated_on=now)
+            rows[tuple(str(row.get(name)) for name in pk_column_names)] = row
+        rows = list(rows.values())
+        if not rows:
+            return
+
+        excluded_columns = pk_column_names + ['created_by', 'created_on', 'updated_by', 'updated_on']
+        if ignored_columns is not None:
+            excluded_columns.extend(ignored_columns)
+        row_columns = list(rows[0])
+        chk_columns = [col for col in row_columns if col not in excluded_columns]
+        if chk_columns:
+            where_condition = text('OR '.join(
+                [f'({table.__tablename__}.{col}::text IS DISTINCT FROM excluded.{col}::text)' for col in chk_columns]))
+        else:
+            where_condition = None
+        chunk_size = max(self.MAX_BIND_PARAMETERS // len(row_columns), 1)
+        for start in range(0, len(rows), chunk_size):
+            stmt = insert(table).values(rows[start:start + chunk_size])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=pk_column_names,
+                set_={col: stmt.excluded[col] for col in row_columns if col not in {'created_by', 'created_on'}},
+                where=where_condition
+            )
+            session.execute(stmt)
+
+    @staticmethod
+    def _format_copy_value(value, is_json=False) -> str:
+        if value is None:
+            return '\\N'
+        if is_json:
+            value = json.dumps(value, ensure_ascii=False)
+        elif isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, ensure_ascii=False)
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            value = value.isoformat()
+        return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+    def _copy_rows(self, session, temp_table_name, columns: list, rows, json_columns: set = None):
+        json_columns = json_columns or set()
+        json_flags = [col in json_columns for col in columns]
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(self._format_copy_value(value, is_json) for value, is_json in zip(row, json_flags)))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f'COPY {temp_table_name} ({", ".join(columns)}) FROM STDIN', buffer)
+        finally:
+            cursor.close()
 
     def update_or_insert_data(self, dataframe, table, column_mapping: dict = None, temp_table_name: str = None,
                               track_change=True, ignored_columns: list = None):
@@ -62,22 +182,43 @@ class Database(object):
             dataframe['created_on'] = datetime.datetime.now(tz=datetime.timezone(datetime.timedelta(hours=8)))
             dataframe['updated_by'] = 'Updated By Script'
             dataframe['updated_on'] = datetime.datetime.now(tz=datetime.timezone(datetime.timedelta(hours=8)))
+        if dataframe.empty:
+            return
+
+        table_columns = set(table.__table__.columns.keys())
+        columns = [column for column in dataframe.columns if column in table_columns]
+        dataframe = dataframe[columns].astype(object)
+        dataframe = dataframe.where(pd.notna(dataframe), None)
 
         with database_session(self.session) as session:
-            session.execute(text(f'DROP TABLE IF EXISTS {temp_table_name} CASCADE;'))
-            session.commit()
+            if len(dataframe) <= config.database_upsert_small_batch_rows:
+                self.upsert_records(session, table, dataframe.to_dict('records'), track_change=False,
+                                    ignored_columns=ignored_columns)
+                session.commit()
+                return
 
             pk_column_names = self.get_table_primary_key_column_names(table)
+            if all(col in columns for col in pk_column_names):
+                dataframe = dataframe[~dataframe[pk_column_names].astype(str).duplicated(keep='last')]
+            json_columns = {col.name for col in table.__table__.columns if isinstance(col.type, JSON)}
+            session.execute(text(
+                f'CREATE TEMP TABLE {temp_table_name} ON COMMIT DROP AS '
+                f'SELECT {", ".join(columns)} FROM {table.__tablename__} WITH NO DATA'
+            ))
+            rows = dataframe.itertuples(index=False, name=None)
+            chunk_rows = config.database_upsert_chunk_rows
+            while True:
+                chunk = list(itertools.islice(rows, chunk_rows))
+                if not chunk:
+                    break
+                self._copy_rows(session, temp_table_name, columns, chunk, json_columns)
+
             excluded_columns = pk_column_names + ['created_by', 'created_on', 'updated_by', 'updated_on']
             if ignored_columns is not None:
                 excluded_columns.extend(ignored_columns)
-            chk_columns = [col.name for col in table.__table__.columns if col.name not in excluded_columns]
-            temp_column_types = self.get_column_types(table)
-            dtype_dict = {col: temp_column_types[col] for col in temp_column_types}
-            dataframe.to_sql(temp_table_name, session.bind, index=False, if_exists='replace',
-                             dtype=dtype_dict)
-            temp_table_class = Table(temp_table_name, MetaData(), autoload_with=session.bind)
-            stmt = insert(table).from_select(temp_table_class.columns, temp_table_class.select())
+            chk_columns = [col for col in columns if col not in excluded_columns]
+            temp_table = sql_table(temp_table_name, *[column(col) for col in columns])
+            stmt = insert(table).from_select(columns, select(*temp_table.columns))
             if chk_columns:
                 where_condition = text('OR '.join(
                     [f'({table.__tablename__}.{col}::text IS DISTINCT FROM excluded.{col}::text)' for col in chk_columns]))
@@ -85,12 +226,8 @@ class Database(object):
                 where_condition = None
             stmt = stmt.on_conflict_do_update(
                 index_elements=pk_column_names,
-                set_={col.name: stmt.excluded[col.name] for col in temp_table_class.columns if
-                      col.name not in {'created_by', 'created_on'}},
+                set_={col: stmt.excluded[col] for col in columns if col not in {'created_by', 'created_on'}},
                 where=where_condition
             )
             session.execute(stmt)
             session.commit()
-
-            session.execute(text(f'DROP TABLE IF EXISTS {temp_table_name} CASCADE;'))
-            session.commit()
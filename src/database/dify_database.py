@@ -1,5 +1,8 @@
+import itertools
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+from sqlalchemy.dialects.postgresql import insert
 
 from src.database.database import Database, database_session
 from src.models.dify_database.datasets import Datasets
@@ -12,14 +15,58 @@ class DifyDatabase(Database):
     def __init__(self, database_name: str):
         super(DifyDatabase, self).__init__(database_name)
 
-    def get_image_path(self, image_id: str) -> Optional[Path]:
+    def get_image_paths(self, image_ids: list[str]) -> dict[str, Path]:
+        if not image_ids:
+            return {}
         with database_session(self.session) as session:
-            query = session.query(UploadFiles.key).filter(UploadFiles.id == image_id)
-            result = query.first()
-        return Path(result[0]) if result else None
+            query = session.query(UploadFiles.id, UploadFiles.key).filter(UploadFiles.id.in_(set(image_ids)))
+            return {str(image_id): Path(key) for image_id, key in query.all()}
 
-    def get_documents(self, dataset_id: str,
-                      with_segment: bool = False, is_enabled: Optional[bool] = None) -> list[Dict[str, Any]]:
+    def get_upload_files(self, file_ids: list[str]) -> list[dict]:
+        if not file_ids:
+            return []
+        columns = UploadFiles.__table__.columns
+        with database_session(self.session) as session:
+            query = session.query(*columns).filter(UploadFiles.id.in_(set(file_ids)))
+            return [dict(zip(columns.keys(), row)) for row in query.all()]
+
+    def register_upload_files(self, upload_files: list[dict]) -> int:
+        if not upload_files:
+            return 0
+        with database_session(self.session) as session:
+            statement = insert(UploadFiles).values(upload_files).on_conflict_do_nothing(index_elements=['id'])
+            result = session.execute(statement)
+            session.commit()
+            return result.rowcount
+
+    def get_dataset_owner(self, dataset_id: str) -> Optional[tuple]:
+        with database_session(self.session) as session:
+            query = session.query(Datasets.tenant_id, Datasets.created_by).filter(Datasets.id == dataset_id)
+            return query.first()
+
+    def get_existing_upload_file_ids(self, file_ids: list[str]) -> set[str]:
+        if not file_ids:
+            return set()
+        with database_session(self.session) as session:
+            query = session.query(UploadFiles.id).filter(UploadFiles.id.in_(file_ids))
+            return {str(result[0]) for result in query.all()}
+
+    def get_existing_document_ids(self, dataset_id: str, document_ids: list[str],
+                                  is_enabled: Optional[bool] = None) -> set[str]:
+        if not document_ids:
+            return set()
+        with database_session(self.session) as session:
+            query = session.query(Documents.id).filter(
+                Documents.dataset_id == dataset_id, Documents.id.in_(set(document_ids))
+            )
+            if is_enabled is not None:
+                query = query.filter(Documents.enabled.is_(is_enabled))
+            return {str(result[0]) for result in query.all()}
+
+    def iter_documents(self, dataset_id: str, with_segment: bool = False, is_enabled: Optional[bool] = None,
+                       chunk_size: int = 500, document_ids: Optional[list[str]] = None) -> Iterator[Dict[str, Any]]:
+        if document_ids is not None and not document_ids:
+            return
         with database_session(self.session) as session:
             query = session.query(
                 Documents.id.label('document_id'),
@@ -33,18 +80,29 @@ class DifyDatabase(Database):
 
             if is_enabled is not None:
                 query = query.filter(Documents.enabled == is_enabled)
+            if document_ids is not None:
+                query = query.filter(Documents.id.in_(document_ids))
 
-            results = query.all()
+            results = iter(query.yield_per(chunk_size))
+            while True:
+                documents = self._process_documents(itertools.islice(results, chunk_size))
+                if not documents:
+                    return
+                if with_segment:
+                    segments = self.get_segments_by_document_ids([document['id'] for document in documents])
+                    for document in documents:
+                        document['segment'] = segments.get(document['id'], [])
+                yield from documents
 
-            documents = self._process_documents(results)
-            if with_segment:
-                for document in documents:
-                    document_id = document['id']
-                    document['segment'] = self.get_segments(document_id)
+    def get_documents(self, dataset_id: str,
+                      with_segment: bool = False, is_enabled: Optional[bool] = None) -> list[Dict[str, Any]]:
+        return list(self.iter_documents(dataset_id, with_segment, is_enabled))
 
-            return documents
+    def get_documents_by_ids(self, dataset_id: str, document_ids: list[str], with_segment: bool = False,
+                             is_enabled: Optional[bool] = None) -> list[Dict[str, Any]]:
+        return list(self.iter_documents(dataset_id, with_segment, is_enabled, document_ids=document_ids))
 
-    def _process_documents(self, documents: list) -> list[Dict[str, Any]]:
+    def _process_documents(self, documents: Iterable) -> list[Dict[str, Any]]:
         return [
             {
                 'id': str(document.document_id),
@@ -71,6 +129,30 @@ class DifyDatabase(Database):
             results = query.all()
             return self._process_segments(results, query.column_descriptions)
 
+    def get_segments_by_document_ids(self, document_ids: list[str]) -> dict[str, list[Dict[str, Any]]]:
+        if not document_ids:
+            return {}
+        with database_session(self.session) as session:
+            query = session.query(
+                DocumentSegments.id,
+                DocumentSegments.position,
+                DocumentSegments.document_id,
+                DocumentSegments.content,
+                DocumentSegments.answer,
+                DocumentSegments.keywords,
+                DocumentSegments.enabled,
+                DocumentSegments.status
+            ).filter(
+                DocumentSegments.document_id.in_(document_ids)
+            ).order_by(
+                DocumentSegments.document_id, DocumentSegments.position
+            )
+            results = query.all()
+            segments = {}
+            for segment in self._process_segments(results, query.column_descriptions):
+                segments.setdefault(segment['document_id'], []).append(segment)
+            return segments
+
     def _process_segments(self, segments: list, columns: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
         keys = [column['name'] for column in columns]
         segments = [
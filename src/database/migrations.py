@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+from sqlalchemy import text, select, insert
+
+from src.models.record_database.schema_migrations import SchemaMigrations
+
+Migration = namedtuple('Migration', ['version', 'description', 'statements'])
+
+MIGRATION_LOCK_ID = 72010419
+
+MIGRATIONS = [
+    Migration(1, 'Add indexes for mail, document and backup lookups', [
+        'CREATE INDEX IF NOT EXISTS ix_mails_lower_entry_id ON mails (lower(entry_id))',
+        'CREATE INDEX IF NOT EXISTS ix_mails_lower_category_sent_on ON mails (lower(category), sent_on)',
+        'CREATE INDEX IF NOT EXISTS ix_mails_created_on ON mails (created_on)',
+        'CREATE INDEX IF NOT EXISTS ix_mails_updated_on ON mails (updated_on)',
+        'CREATE INDEX IF NOT EXISTS ix_document_segments_document_id ON document_segments (document_id)',
+        'CREATE INDEX IF NOT EXISTS ix_documents_dataset_id ON documents (dataset_id)',
+        'CREATE INDEX IF NOT EXISTS ix_mails_documents_mapping_document_id ON mails_documents_mapping (document_id)',
+        'CREATE INDEX IF NOT EXISTS ix_document_backups_tag ON document_backups (tag varchar_pattern_ops)',
+    ]),
+    Migration(2, 'Store mail sent_on and received_on as timestamps', [
+        "ALTER TABLE mails "
+        "ALTER COLUMN sent_on TYPE TIMESTAMP WITHOUT TIME ZONE USING NULLIF(sent_on::text, '')::timestamp, "
+        "ALTER COLUMN received_on TYPE TIMESTAMP WITHOUT TIME ZONE USING NULLIF(received_on::text, '')::timestamp",
+    ]),
+]
+
+
+def get_applied_versions(connection) -> set:
+    SchemaMigrations.__table__.create(connection, checkfirst=True)
+    return set(connection.execute(select(SchemaMigrations.version)).scalars())
+
+
+def get_pending_migrations(connection, migrations: list = None) -> list:
+    applied_versions = get_applied_versions(connection)
+    return [
+        migration for migration in sorted(migrations or MIGRATIONS, key=lambda item: item.version)
+        if migration.version not in applied_versions
+    ]
+
+
+def apply_migrations(connection, migrations: list = None) -> list[int]:
+    connection.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': MIGRATION_LOCK_ID})
+    applied_versions = get_applied_versions(connection)
+    applied = []
+    for migration in sorted(migrations or MIGRATIONS, key=lambda item: item.version):
+        if migration.version in applied_versions:
+            continue
+        print(f'Applying migration {migration.version}: {migration.description}')
+        for statement in migration.statements:
+            connection.execute(text(statement))
+        connection.execute(
+            insert(SchemaMigrations).values(version=migration.version, description=migration.description)
+        )
+        applied.append(migration.version)
+    return applied
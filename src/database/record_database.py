@@ -1,31 +1,64 @@
 import datetime
 import uuid
+from typing import Iterator
 
 import pandas as pd
 import psycopg2
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import update, func, or_, desc, asc
+from sqlalchemy import update, func, or_, desc, asc, select, delete, any_, bindparam, VARCHAR, text, literal, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import ProgrammingError
 
 from src.database.database import Database, database_session
+from src.database.migrations import apply_migrations, get_pending_migrations
 from src.models.record_database.agents import Agents
 from src.models.record_database.datasets import Datasets
 from src.models.record_database.document_backups import DocumentBackups
 from src.models.record_database.document_segments import DocumentSegments
 from src.models.record_database.documents import Documents
+from src.models.record_database.image_uploads import ImageUploads
 from src.models.record_database.docx_files import DocxFiles
 from src.models.record_database.keywords import Keywords
 from src.models.record_database.mails import Mails
 from src.models.record_database.mails_documents_mapping import MailsDocumentsMapping
 from src.models.record_database.news import News
+from src.models.record_database.sync_states import SyncStates
 from src.utils.config import config
 from src.utils.random_generator import random_name
 
 
 class RecordDatabase(Database):
+    TABLES = [
+        Agents, Datasets, DocumentBackups, DocumentSegments, Documents, DocxFiles, ImageUploads, Keywords, Mails,
+        MailsDocumentsMapping, News, SyncStates
+    ]
+
     def __init__(self, database_name: str):
         super(RecordDatabase, self).__init__(database_name)
-        self.tag = self._generate_tag()
+        self._tag = None
+
+    @property
+    def tag(self) -> str:
+        if self._tag is None:
+            self._tag = self._generate_tag()
+        return self._tag
+
+    def bootstrap(self):
+        if not super(RecordDatabase, self).bootstrap(self.TABLES):
+            return
+        pending = self.get_pending_migrations()
+        if pending:
+            print(f'{len(pending)} record database migrations pending '
+                  f'({", ".join(str(migration.version) for migration in pending)}), '
+                  f'run migrate_record_database.py to apply them')
+
+    def get_pending_migrations(self) -> list:
+        with self.engine.begin() as connection:
+            return get_pending_migrations(connection)
+
+    def migrate(self) -> list[int]:
+        with self.engine.begin() as connection:
+            return apply_migrations(connection)
 
     def save_knowledge_base_info(self, knowledge_base: dict):
         table = Datasets
@@ -45,6 +78,29 @@ class RecordDatabase(Database):
                 .filter(Documents.id.in_(document_ids)).delete(synchronize_session='fetch')
             session.commit()
 
+    def reconcile_documents(self, dataset_id: str, documents: list[dict], segments: dict[str, list[dict]]):
+        self.create_table_if_not_exists(Documents)
+        self.create_table_if_not_exists(DocumentSegments)
+        document_ids = [document['id'] for document in documents]
+        segment_ids = [segment['id'] for document_segments in segments.values() for segment in document_segments]
+        with database_session(self.session) as session:
+            stale_document_ids = select(Documents.id).where(
+                Documents.dataset_id == dataset_id, Documents.id.notin_(document_ids)
+            )
+            session.execute(delete(DocumentSegments).where(DocumentSegments.document_id.in_(stale_document_ids)))
+            session.execute(delete(Documents).where(
+                Documents.dataset_id == dataset_id, Documents.id.notin_(document_ids)
+            ))
+            if segments:
+                session.execute(delete(DocumentSegments).where(
+                    DocumentSegments.document_id.in_(list(segments)), DocumentSegments.id.notin_(segment_ids)
+                ))
+            self.upsert_records(session, Documents, documents)
+            self.upsert_records(session, DocumentSegments, [
+                segment for document_segments in segments.values() for segment in document_segments
+            ])
+            session.commit()
+
     def save_segments(self, segments: list):
         table = DocumentSegments
         self.create_table_if_not_exists(table)
@@ -61,10 +117,11 @@ class RecordDatabase(Database):
             stmt.delete(synchronize_session='fetch')
             session.commit()
 
-    def get_documents(self, url: str, dataset_id: str, with_segment=False, is_enabled: bool = None) -> list:
+    def iter_documents(self, url: str, dataset_id: str, with_segment=False, is_enabled: bool = None,
+                       document_ids: list = None, chunk_size: int = 1000) -> Iterator[dict]:
         try:
             with database_session(self.session) as session:
-                query = session.query(
+                stmt = select(
                     Documents.id.label('document_id'),
                     Documents.position.label('document_position'),
                     Documents.name,
@@ -74,51 +131,57 @@ class RecordDatabase(Database):
                     DocumentSegments.content,
                     DocumentSegments.answer,
                     DocumentSegments.keywords
+                ).select_from(
+                    DocumentSegments
                 ).outerjoin(
                     Documents, DocumentSegments.document_id == Documents.id
                 ).outerjoin(
                     Datasets, Datasets.id == Documents.dataset_id
-                ).filter(
+                ).where(
                     Datasets.url == url, Datasets.id == dataset_id
+                ).order_by(
+                    Documents.position, Documents.id, DocumentSegments.position
                 )
                 if is_enabled is not None:
-                    query = query.filter(Documents.enabled == is_enabled)
-                results = query.all()
-            records = {}
-            for result in results:
-                record = records.get(result.document_id)
-                if record is None:
-                    record = {
-                        'id': str(result.document_id),
-                        'position': result.document_position,
-                        'name': result.name,
-                        'dataset_id': str(result.dataset_id)
-                    }
+                    stmt = stmt.where(Documents.enabled == is_enabled)
+                if document_ids is not None:
+                    stmt = stmt.where(Documents.id.in_(document_ids))
+                record = None
+                for result in session.execute(stmt.execution_options(yield_per=chunk_size)):
+                    if record is None or record['id'] != str(result.document_id):
+                        if record is not None:
+                            yield record
+                        record = {
+                            'id': str(result.document_id),
+                            'position': result.document_position,
+                            'name': result.name,
+                            'dataset_id': str(result.dataset_id)
+                        }
+                        if with_segment:
+                            record['segment'] = []
                     if with_segment:
-                        record['segment'] = []
-                    records[result.document_id] = record
-                if with_segment:
-                    segment = {
-                        'id': str(result.segment_id),
-                        'position': result.position,
-                        'document_id': str(result.document_id),
-                        'content': result.content,
-                        'answer': result.answer,
-                        'keywords': result.keywords.split(',')
-                    }
-                    record['segment'].append(segment)
-
-            return list(records.values())
+                        record['segment'].append({
+                            'id': str(result.segment_id),
+                            'position': result.position,
+                            'document_id': str(result.document_id),
+                            'content': result.content,
+                            'answer': result.answer,
+                            'keywords': result.keywords.split(',')
+                        })
+                if record is not None:
+                    yield record
         except ProgrammingError as e:
             if f'relation "{Documents.__tablename__}" does not exist' in str(e):
                 print(f'Table "{Documents.__tablename__}" does not exist. Returning an empty list.')
-                return []
             elif f'relation "{DocumentSegments.__tablename__}" does not exist' in str(e):
                 print(f'Table "{DocumentSegments.__tablename__}" does not exist. Returning an empty list.')
-                return []
             else:
                 raise e
 
+    def get_documents(self, url: str, dataset_id: str, with_segment=False, is_enabled: bool = None,
+                      document_ids: list = None) -> list:
+        return list(self.iter_documents(url, dataset_id, with_segment, is_enabled, document_ids))
+
     def get_segments(self, document_id):
         with database_session(self.session) as session:
             try:
@@ -147,6 +210,41 @@ class RecordDatabase(Database):
                 else:
                     raise e
 
+    def get_segments_by_document_ids(self, document_ids: list) -> dict[str, list[dict]]:
+        if not document_ids:
+            return {}
+        with database_session(self.session) as session:
+            try:
+                query = session.query(
+                    DocumentSegments.id,
+                    DocumentSegments.position,
+                    DocumentSegments.document_id,
+                    DocumentSegments.content,
+                    DocumentSegments.answer,
+                    DocumentSegments.keywords,
+                    DocumentSegments.enabled
+                ).filter(
+                    DocumentSegments.document_id.in_(document_ids)
+                ).order_by(
+                    DocumentSegments.document_id, DocumentSegments.position
+                )
+                keys = [column['name'] for column in query.column_descriptions]
+                segments = {}
+                for result in query.all():
+                    segment = {
+                        key: str(value) if key in ['id', 'document_id'] else value.split(
+                            ", ") if key == 'keywords' else value
+                        for key, value in zip(keys, result)
+                    }
+                    segments.setdefault(segment['document_id'], []).append(segment)
+                return segments
+            except ProgrammingError as e:
+                if f'relation "{DocumentSegments.__tablename__}" does not exist' in str(e):
+                    print(f'Table "{DocumentSegments.__tablename__}" does not exist. Returning an empty dict.')
+                    return {}
+                else:
+                    raise e
+
     def save_docx_file(self, docx_file: pd.DataFrame):
         table = DocxFiles
         self.create_table_if_not_exists(table)
@@ -229,6 +327,22 @@ class RecordDatabase(Database):
                 else:
                     raise
 
+    def get_mail_ids_by_entry_ids(self, entry_ids: list) -> dict[str, str]:
+        entry_ids = list({entry_id.lower() for entry_id in entry_ids if entry_id})
+        if not entry_ids:
+            return {}
+        with database_session(self.session) as session:
+            try:
+                results = session.query(func.lower(Mails.entry_id), Mails.id).filter(
+                    func.lower(Mails.entry_id) == any_(bindparam('entry_ids', entry_ids, type_=ARRAY(VARCHAR)))
+                ).all()
+                return {entry_id: str(mail_id) for entry_id, mail_id in results}
+            except ProgrammingError as e:
+                if isinstance(e.orig, psycopg2.errors.UndefinedTable):
+                    return {}
+                else:
+                    raise
+
     def save_mails(self, mails, ignored_columns=None):
         table = Mails
         self.create_table_if_not_exists(table)
@@ -240,27 +354,53 @@ class RecordDatabase(Database):
                 df[column] = df[column].astype(str)
         return df
 
+    def convert_timestamp_columns(self, df, columns: list):
+        for column in columns:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column])
+        return df
+
+    def iter_mails(self, columns: list = None, categories: list = None, get_recent_updated: bool = False,
+                   time_delta: relativedelta = None, sort_order: str = None,
+                   chunk_size: int = 1000) -> Iterator[pd.DataFrame]:
+        table = Mails
+        columns = columns or table.__table__.columns.keys()
+        sent_on = func.coalesce(table.sent_on, literal(datetime.datetime.max, table.sent_on.type))
+        key_columns = [table.id] if sort_order not in ('asc', 'desc') else [sent_on, table.id]
+        stmt = select(*[getattr(table, column) for column in columns], *key_columns)
+        if categories is not None:
+            stmt = stmt.where(func.lower(table.category).in_([category.lower() for category in categories]))
+        if get_recent_updated:
+            now = datetime.datetime.now(tz=datetime.timezone(datetime.timedelta(hours=8)))
+            ago = now - time_delta
+            stmt = stmt.where(or_(table.created_on >= ago, table.updated_on >= ago))
+
+        if sort_order == 'desc':
+            stmt = stmt.order_by(*[desc(key_column) for key_column in key_columns])
+        else:
+            stmt = stmt.order_by(*[asc(key_column) for key_column in key_columns])
+        last_key = None
+        while True:
+            chunk_stmt = stmt
+            if last_key is not None:
+                keyset = tuple_(*key_columns)
+                chunk_stmt = stmt.where(keyset < last_key if sort_order == 'desc' else keyset > last_key)
+            with database_session(self.session) as session:
+                rows = session.execute(chunk_stmt.limit(chunk_size)).all()
+            if not rows:
+                return
+            last_key = tuple_(*rows[-1][len(columns):])
+            mails = pd.DataFrame.from_records([row[:len(columns)] for row in rows], columns=columns)
+            yield self.convert_timestamp_columns(self.convert_uuid_columns(mails), ['sent_on', 'received_on'])
+            if len(rows) < chunk_size:
+                return
+
     def get_mails(self, categories: list = None, get_recent_updated: bool = False, time_delta: relativedelta = None,
-                  sort_order: str = None):
-        with database_session(self.session) as session:
-            table = Mails
-            query = session.query(table)
-            if categories is not None:
-                query = query.filter(func.lower(table.category).in_([category.lower() for category in categories]))
-            if get_recent_updated:
-                now = datetime.datetime.now(tz=datetime.timezone(datetime.timedelta(hours=8)))
-                ago = now - time_delta
-                query = query.filter(or_(table.created_on >= ago, table.updated_on >= ago))
-
-            if sort_order == 'asc':
-                query = query.order_by(asc(table.sent_on))
-            elif sort_order == 'desc':
-                query = query.order_by(desc(table.sent_on))
-            results = query.all()
-            df = pd.DataFrame(
-                [{column: getattr(x, column) for column in table.__table__.columns.keys()} for x in results])
-            df = self.convert_uuid_columns(df)
-            return df
+                  sort_order: str = None, columns: list = None):
+        chunks = list(self.iter_mails(columns, categories, get_recent_updated, time_delta, sort_order))
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
 
     def get_mail_related_document_ids(self, mail_id, dataset_id) -> list:
         try:
@@ -318,6 +458,36 @@ class RecordDatabase(Database):
                 session.add(new_mapping)
                 session.commit()
 
+    def save_mail_document_mappings(self, mappings: list[tuple], batch_size: int = 5000):
+        table = MailsDocumentsMapping
+        self.create_table_if_not_exists(table)
+        self.create_table_if_not_exists(Documents)
+        stmt = text(f"""
+            WITH input AS (
+                SELECT DISTINCT mail_id, document_id, dataset_id
+                FROM unnest(CAST(:mail_ids AS uuid[]), CAST(:document_ids AS uuid[]), CAST(:dataset_ids AS uuid[]))
+                    AS t(mail_id, document_id, dataset_id)
+            ), replaced AS (
+                DELETE FROM {table.__tablename__} AS mapping
+                USING {Documents.__tablename__} AS document
+                WHERE mapping.document_id = document.id
+                    AND (mapping.mail_id, document.dataset_id) IN (SELECT mail_id, dataset_id FROM input)
+                    AND (mapping.mail_id, mapping.document_id) NOT IN (SELECT mail_id, document_id FROM input)
+            )
+            INSERT INTO {table.__tablename__} (mail_id, document_id)
+            SELECT DISTINCT mail_id, document_id FROM input
+            ON CONFLICT DO NOTHING
+        """)
+        with database_session(self.session) as session:
+            for start in range(0, len(mappings), batch_size):
+                batch = mappings[start:start + batch_size]
+                session.execute(stmt, {
+                    'mail_ids': [str(mail_id).lower() for mail_id, _, _ in batch],
+                    'document_ids': [str(document_id).lower() for _, document_id, _ in batch],
+                    'dataset_ids': [str(dataset_id).lower() for _, _, dataset_id in batch],
+                })
+            session.commit()
+
     def backup_documents(self, documents, ignored_columns=None):
         documents['tag'] = self.tag
         print(f'Backing up {documents["document_name"].nunique()} documents with tag "{self.tag}" to database')
@@ -387,3 +557,30 @@ class RecordDatabase(Database):
                 return []
             else:
                 raise e
+
+    def save_image_uploads(self, environment: str, uploads: dict[str, str], algorithm: str, ignored_columns=None):
+        table = ImageUploads
+        self.create_table_if_not_exists(table)
+        df = pd.DataFrame([
+            {'hash_value': hash_value, 'algorithm': algorithm, 'environment': environment, 'file_id': file_id}
+            for hash_value, file_id in uploads.items()
+        ])
+        self.update_or_insert_data(df, table, ignored_columns=ignored_columns)
+
+    def get_image_uploads(self, environment: str, hash_values: list, algorithm: str) -> dict[str, str]:
+        if not hash_values:
+            return {}
+        try:
+            with database_session(self.session) as session:
+                table = ImageUploads
+                query = session.query(table.hash_value, table.file_id).filter(
+                    table.environment == environment,
+                    table.algorithm == algorithm,
+                    table.hash_value.in_(hash_values)
+                )
+                return {hash_value: str(file_id) for hash_value, file_id in query.all() if file_id is not None}
+        except ProgrammingError as e:
+            if f'relation "{ImageUploads.__tablename__}" does not exist' in str(e):
+                return {}
+            else:
+                raise e
@@ -7,4 +7,6 @@ class Datasets(Base):
     __tablename__ = 'datasets'
 
     id = Column(Uuid, primary_key=True)
+    tenant_id = Column(Uuid)
     name = Column(VARCHAR(255))
+    created_by = Column(Uuid)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Uuid, VARCHAR
+from sqlalchemy import Column, Uuid, VARCHAR, Integer, Boolean, TIMESTAMP, TEXT
 
 from src.models.dify_database.base import Base
 
@@ -7,4 +7,18 @@ class UploadFiles(Base):
     __tablename__ = 'upload_files'
 
     id = Column(Uuid, primary_key=True)
+    tenant_id = Column(Uuid)
+    storage_type = Column(VARCHAR(255))
     key = Column(VARCHAR(255))
+    name = Column(VARCHAR(255))
+    size = Column(Integer)
+    extension = Column(VARCHAR(255))
+    mime_type = Column(VARCHAR(255))
+    created_by_role = Column(VARCHAR(255))
+    created_by = Column(Uuid)
+    created_at = Column(TIMESTAMP)
+    used = Column(Boolean)
+    used_by = Column(Uuid)
+    used_at = Column(TIMESTAMP)
+    hash = Column(VARCHAR(255))
+    source_url = Column(TEXT)
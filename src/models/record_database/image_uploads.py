@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Uuid, VARCHAR, TIMESTAMP, func
+
+from src.models.record_database.base import Base
+
+
+class ImageUploads(Base):
+    __tablename__ = 'image_uploads'
+
+    hash_value = Column(VARCHAR(255), primary_key=True, nullable=False)
+    algorithm = Column(VARCHAR(64), primary_key=True, nullable=False)
+    environment = Column(VARCHAR(20), primary_key=True, nullable=False)
+    file_id = Column(Uuid)
+    created_by = Column(VARCHAR(255))
+    created_on = Column(TIMESTAMP(timezone=False), server_default=func.timezone('Asia/Shanghai', func.now()))
+    updated_by = Column(VARCHAR(255))
+    updated_on = Column(TIMESTAMP(timezone=False), server_default=func.timezone('Asia/Shanghai', func.now()))
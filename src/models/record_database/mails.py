@@ -14,8 +14,8 @@ class Mails(Base):
     sender_name = Column(String)
     cc = Column(String)
     subject = Column(String)
-    sent_on = Column(String)
-    received_on = Column(String)
+    sent_on = Column(TIMESTAMP(timezone=False))
+    received_on = Column(TIMESTAMP(timezone=False))
     body = Column(String)
     html_body = Column(String)
     cleaned_body = Column(JSON)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, VARCHAR, TIMESTAMP, func
+
+from src.models.record_database.base import Base
+
+
+class SchemaMigrations(Base):
+    __tablename__ = 'schema_migrations'
+
+    version = Column(Integer, primary_key=True)
+    description = Column(VARCHAR(255))
+    applied_on = Column(TIMESTAMP(timezone=False), server_default=func.timezone('Asia/Shanghai', func.now()))
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Uuid, VARCHAR, TIMESTAMP, func, JSON
+
+from src.models.record_database.base import Base
+
+
+class SyncStates(Base):
+    __tablename__ = 'sync_states'
+
+    environment = Column(VARCHAR(20), primary_key=True)
+    dataset_id = Column(Uuid, primary_key=True)
+    document_name = Column(VARCHAR(255), primary_key=True)
+    document_id = Column(Uuid)
+    content_hash = Column(VARCHAR(64))
+    segment_hashes = Column(JSON)
+    synced_on = Column(TIMESTAMP(timezone=False))
+    reconciled_on = Column(TIMESTAMP(timezone=False))
+    created_by = Column(VARCHAR(255))
+    created_on = Column(TIMESTAMP(timezone=False), server_default=func.timezone('Asia/Shanghai', func.now()))
+    updated_by = Column(VARCHAR(255))
+    updated_on = Column(TIMESTAMP(timezone=False), server_default=func.timezone('Asia/Shanghai', func.now()))
@@ -1,12 +1,16 @@
 import json
 import re
+import time
 from pathlib import Path
 
+from src.utils.stream_metrics import stream_metrics
+
 
 class App(object):
     def __init__(self, app_api):
         self.app_api = app_api
         self.user = 'python.script'
+        self.name = type(self).__name__.removesuffix('Agent').lower() or 'app'
 
     def query_app(self, user_input, streaming_mode: bool = True, session_id: str = '', user: str = '',
                   files: list[Path] = None, parse_json: bool = True):
@@ -26,13 +30,25 @@ class App(object):
             'transfer_method': 'local_file',
             'upload_file_id': file_id
         } for file_id in file_ids] if file_ids else []
-        response = self.app_api.send_query(
-            user_input=user_input,
-            streaming_mode=streaming_mode,
-            session_id=session_id,
-            user=user,
-            files=files_data,
-        )
+        if streaming_mode:
+            start_time = time.perf_counter()
+            events = self.app_api.stream_query(
+                user_input=user_input,
+                session_id=session_id,
+                user=user,
+                files=files_data,
+            )
+            response = None
+            if events is not None:
+                response = self.app_api.handle_streaming_events(self._track_stream(events, start_time))
+        else:
+            response = self.app_api.send_query(
+                user_input=user_input,
+                streaming_mode=streaming_mode,
+                session_id=session_id,
+                user=user,
+                files=files_data,
+            )
 
         try:
             if not isinstance(response, dict):
@@ -50,6 +66,19 @@ class App(object):
             print(f'Error: {e}')
             return None
 
+    def _track_stream(self, events, start_time: float):
+        time_to_first_token = None
+        try:
+            for event in events:
+                if time_to_first_token is None and event.get('event', '').endswith('message') and event.get('answer'):
+                    time_to_first_token = time.perf_counter() - start_time
+                yield event
+        finally:
+            close = getattr(events, 'close', None)
+            if close is not None:
+                close()
+            stream_metrics.record(self.name, time_to_first_token, time.perf_counter() - start_time)
+
     def _attempt_json_parse(self, answer):
         try:
             return json.loads(self._sanitize_json_response(answer))
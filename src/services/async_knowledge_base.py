@@ -0,0 +1,80 @@
+import asyncio
+
+from src.api.async_dataset_api import AsyncDatasetApi
+from src.services.indexing_watcher import AsyncIndexingWatcher
+
+
+class AsyncKnowledgeBase(object):
+    def __init__(self, env, dataset_id, dataset_name, api: AsyncDatasetApi):
+        self.env = env
+        self.dataset_id = dataset_id
+        self.dataset_name = dataset_name
+        self.api = api
+        self.indexing_watcher = AsyncIndexingWatcher(api, dataset_id)
+
+    async def __aenter__(self):
+        await self.api.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.api.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def fetch_documents(self, with_segment=False, is_enabled: bool = None) -> list[dict]:
+        documents = await self.api.get_documents_in_dataset(self.dataset_id, is_enabled)
+        for document in documents:
+            document['dataset_id'] = self.dataset_id
+        if with_segment:
+            segments = await asyncio.gather(*(
+                self.api.get_segments_from_document(self.dataset_id, document['id']) for document in documents
+            ))
+            for document, document_segments in zip(documents, segments):
+                document['segment'] = document_segments
+        return documents
+
+    async def _wait_document_embedding(self, batch_id, document_id, status='completed'):
+        await self.indexing_watcher.wait(batch_id, document_id, status)
+
+    async def _add_segments(self, document_id, batch_id, segments: list[dict]):
+        await self._wait_document_embedding(batch_id, document_id)
+        if not segments:
+            return
+        segment_ids = await self.api.create_segments_in_document(self.dataset_id, document_id, segments)
+        disabled_segments = [
+            {**segment, 'id': segment_id, 'enabled': False}
+            for segment, segment_id in zip(segments, segment_ids) if not segment.get('enabled')
+        ]
+        if disabled_segments:
+            await self.api.update_segments_in_document(self.dataset_id, document_id, disabled_segments)
+
+    async def create_document_by_text(self, documents: list[dict]) -> dict:
+        docs_name_id_mapping = {}
+        tasks = []
+        for document in documents:
+            document_id, batch_id = await self.api.create_document(self.dataset_id, document['name'])
+            docs_name_id_mapping[document['name']] = document_id
+            tasks.append(asyncio.create_task(self._add_segments(document_id, batch_id, document.get('segment', []))))
+        await asyncio.gather(*tasks)
+        return docs_name_id_mapping
+
+    async def delete_documents(self, document_ids: list[str]):
+        await asyncio.gather(*(
+            self.api.delete_document(self.dataset_id, document_id) for document_id in document_ids if document_id
+        ))
+
+    async def update_segment_in_document(self, segment):
+        await self.api.update_segment_in_document(
+            self.dataset_id,
+            segment['document_id'],
+            segment['id'],
+            segment['content'],
+            segment['answer'],
+            segment['keywords'],
+            segment.get('enabled', True)
+        )
+
+    async def update_segments(self, segments: list[dict]):
+        await asyncio.gather(*(self.update_segment_in_document(segment) for segment in segments))
+
+    async def empty_dataset(self):
+        documents = await self.api.get_documents_in_dataset(self.dataset_id)
+        await self.delete_documents([document['id'] for document in documents])
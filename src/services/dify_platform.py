@@ -1,8 +1,10 @@
 from typing import Optional
 
+from src.api.async_dataset_api import AsyncDatasetApi
 from src.api.dataset_api import DatasetApi
 from src.database.dify_database import DifyDatabase
 from src.database.record_database import RecordDatabase
+from src.services.async_knowledge_base import AsyncKnowledgeBase
 from src.services.knowledge_base import KnowledgeBase
 from src.services.s3_handler import S3Handler
 from src.services.studio import Studio
@@ -18,13 +20,21 @@ class DifyPlatform(object):
         self.env = env.upper()
         self.api_config = config.get_api_config(self.env, apps, include_dataset=include_dataset)
         self.studio = Studio(apps, self.api_config)
-        self.datasets = []
+        self.include_dataset = include_dataset
+        self._datasets = None
         if include_dataset:
-            self.dataset_api = DatasetApi(self.api_config.url, self.api_config.dataset_token)
-            self.datasets = self.dataset_api.get_datasets(max_attempt=3)
+            self.dataset_api = DatasetApi(self.api_config.url, self.api_config.dataset_token, self.env)
         self.record_db = RecordDatabase('record')
+        self.record_db.bootstrap()
         self._s3 = None
         self._db = None
+        self._async_dataset_api = None
+
+    @property
+    def datasets(self) -> list[dict]:
+        if self._datasets is None:
+            self._datasets = self.dataset_api.get_datasets(max_attempt=3) if self.include_dataset else []
+        return self._datasets
 
     @property
     def s3(self):
@@ -34,10 +44,17 @@ class DifyPlatform(object):
                 s3_config.access_key_id,
                 s3_config.secret_access_key,
                 s3_config.region,
-                s3_config.bucket
+                s3_config.bucket,
+                s3_config.endpoint_url
             )
         return self._s3
 
+    @property
+    def async_dataset_api(self):
+        if self._async_dataset_api is None:
+            self._async_dataset_api = AsyncDatasetApi(self.api_config.url, self.api_config.dataset_token, self.env)
+        return self._async_dataset_api
+
     @property
     def db(self):
         if self._db is None:
@@ -55,3 +72,7 @@ class DifyPlatform(object):
     def init_knowledge_base(self, dataset_name):
         dataset_id = self.get_dataset_id_by_name(dataset_name)
         return KnowledgeBase(self.env, dataset_id, dataset_name, self.dataset_api, self.db, self.record_db)
+
+    def init_async_knowledge_base(self, dataset_name):
+        dataset_id = self.get_dataset_id_by_name(dataset_name)
+        return AsyncKnowledgeBase(self.env, dataset_id, dataset_name, self.async_dataset_api)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+
+def segment_hash(segment: dict, with_keywords: bool = True) -> str:
+    fields = [segment.get('content') or '', segment.get('answer') or '', bool(segment.get('enabled'))]
+    if with_keywords:
+        fields.append(sorted(segment.get('keywords') or []))
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def input_segment_hash(segment: dict) -> str:
+    return segment_hash(segment, with_keywords=bool(segment.get('keywords')))
+
+
+def document_hash(document: dict) -> str:
+    fields = [document['name'], [input_segment_hash(segment) for segment in document.get('segment', [])]]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def segments_match(current_segments: list[dict], segment_hashes: list[str]) -> bool:
+    current_segments = sorted(current_segments, key=lambda segment: segment.get('position', 0))
+    if len(current_segments) != len(segment_hashes):
+        return False
+    return all(
+        hash_value in (segment_hash(segment), segment_hash(segment, with_keywords=False))
+        for segment, hash_value in zip(current_segments, segment_hashes)
+    )
+
+
+@dataclass
+class SegmentDiff(object):
+    unchanged: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    created: list = field(default_factory=list)
+    deleted: list = field(default_factory=list)
+    in_order: bool = True
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.updated or self.created or self.deleted)
+
+    @property
+    def embeddings_avoided(self) -> int:
+        return len(self.unchanged)
+
+
+def _add_matched_segments(diff: SegmentDiff, current_segment: dict, segment: dict):
+    with_keywords = bool(segment.get('keywords'))
+    if segment_hash(current_segment, with_keywords) == segment_hash(segment, with_keywords):
+        diff.unchanged.append(current_segment)
+    else:
+        diff.updated.append((current_segment, segment))
+
+
+def diff_segments(current_segments: list[dict], segments: list[dict]) -> SegmentDiff:
+    current_segments = sorted(current_segments, key=lambda segment: segment.get('position', 0))
+    current_hashes = [segment_hash(segment, with_keywords=False) for segment in current_segments]
+    hashes = [segment_hash(segment, with_keywords=False) for segment in segments]
+    diff = SegmentDiff()
+    indexes = {}
+    created = []
+    deleted = []
+    matcher = SequenceMatcher(None, current_hashes, hashes, autojunk=False)
+    for tag, current_start, current_end, start, end in matcher.get_opcodes():
+        current_block = current_segments[current_start:current_end]
+        block = segments[start:end]
+        for index, current_segment in enumerate(current_block[:len(block)], start):
+            indexes[id(current_segment)] = index
+        if tag == 'equal':
+            for current_segment, segment in zip(current_block, block):
+                _add_matched_segments(diff, current_segment, segment)
+        else:
+            diff.updated.extend(zip(current_block, block))
+            deleted.extend(current_block[len(block):])
+            created.extend(enumerate(block[len(current_block):], start + len(current_block)))
+
+    deleted_by_hash = defaultdict(list)
+    for current_segment in deleted:
+        deleted_by_hash[segment_hash(current_segment, with_keywords=False)].append(current_segment)
+    created_indexes = []
+    for index, segment in created:
+        candidates = deleted_by_hash.get(segment_hash(segment, with_keywords=False))
+        if candidates:
+            current_segment = candidates.pop(0)
+            indexes[id(current_segment)] = index
+            _add_matched_segments(diff, current_segment, segment)
+        else:
+            diff.created.append(segment)
+            created_indexes.append(index)
+    diff.deleted = [current_segment for current_segment in deleted if id(current_segment) not in indexes]
+    stored_order = [
+        indexes[id(current_segment)] for current_segment in current_segments if id(current_segment) in indexes
+    ] + created_indexes
+    diff.in_order = stored_order == sorted(stored_order)
+    return diff
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.database.dify_database import DifyDatabase
+from src.services.s3_handler import S3Handler
+
+
+class ImageReplicator(object):
+    def __init__(self, source_db: DifyDatabase, source_s3: S3Handler, target_db: DifyDatabase, target_s3: S3Handler,
+                 max_workers: int = 8):
+        self.source_db = source_db
+        self.source_s3 = source_s3
+        self.target_db = target_db
+        self.target_s3 = target_s3
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _get_target_key(key: str, source_tenant_id, target_tenant_id) -> str:
+        prefix = f'upload_files/{source_tenant_id}/'
+        if key.startswith(prefix):
+            return f'upload_files/{target_tenant_id}/{key[len(prefix):]}'
+        return key
+
+    def _to_target_upload_file(self, upload_file: dict, tenant_id, created_by) -> dict:
+        return {
+            **upload_file,
+            'key': self._get_target_key(upload_file['key'], upload_file['tenant_id'], tenant_id),
+            'tenant_id': tenant_id,
+            'created_by_role': 'account',
+            'created_by': created_by,
+            'used_by': created_by if upload_file['used_by'] else None,
+        }
+
+    def replicate(self, file_ids: list[str], target_dataset_id: str) -> set[str]:
+        file_ids = list(dict.fromkeys(file_ids))
+        existing_file_ids = self.target_db.get_existing_upload_file_ids(file_ids)
+        upload_files = self.source_db.get_upload_files(
+            [file_id for file_id in file_ids if file_id not in existing_file_ids]
+        )
+        if not upload_files:
+            print(f'No images to replicate, {len(existing_file_ids)} of {len(file_ids)} already in target')
+            return existing_file_ids
+        owner = self.target_db.get_dataset_owner(target_dataset_id)
+        if owner is None:
+            raise ValueError(f'Target dataset {target_dataset_id} not found')
+        tenant_id, created_by = owner
+        target_upload_files = [
+            self._to_target_upload_file(upload_file, tenant_id, created_by) for upload_file in upload_files
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            copied = list(executor.map(
+                lambda pair: self.target_s3.copy_from(self.source_s3, pair[0]['key'], pair[1]['key']),
+                zip(upload_files, target_upload_files)
+            ))
+        replicated = [upload_file for upload_file, is_copied in zip(target_upload_files, copied) if is_copied]
+        self.target_db.register_upload_files(replicated)
+        print(f'Replicated {len(replicated)} of {len(upload_files)} images, '
+              f'{len(existing_file_ids)} already in target')
+        return existing_file_ids | {str(upload_file['id']) for upload_file in replicated}
@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from src.services.indexing_watcher import IndexingNotCompletedError
+from src.utils.config import config
+
+
+class SplitCountExceeded(Exception):
+    pass
+
+
+class ImageContainer(object):
+    def __init__(self, images: list[Path], split: int = 1, index: int = 0):
+        self.images = images
+        self.split = split
+        self.index = index
+        self.document_id = None
+        self.indexing = None
+
+    def bisect(self) -> list['ImageContainer']:
+        middle = len(self.images) // 2
+        return [
+            ImageContainer(self.images[:middle], self.split + 1, self.index * 2),
+            ImageContainer(self.images[middle:], self.split + 1, self.index * 2 + 1)
+        ]
+
+
+class ImageUploader(object):
+    def __init__(self, knowledge_base, max_count: Optional[int] = None, max_bytes: Optional[int] = None,
+                 max_workers: Optional[int] = None, max_split: Optional[int] = None):
+        self.knowledge_base = knowledge_base
+        self.max_count = max_count or config.upload_images_max_count
+        self.max_bytes = max_bytes or config.upload_images_max_bytes
+        self.max_workers = max_workers or config.upload_images_max_workers
+        self.max_split = max_split or config.upload_images_max_split
+
+    def group_images(self, images: list[Path]) -> list[ImageContainer]:
+        containers = []
+        container_images = []
+        container_bytes = 0
+        for image in images:
+            size = Path(image).stat().st_size
+            if container_images and (len(container_images) >= self.max_count
+                                     or container_bytes + size > self.max_bytes):
+                containers.append(ImageContainer(container_images, index=len(containers)))
+                container_images = []
+                container_bytes = 0
+            container_images.append(image)
+            container_bytes += size
+        if container_images:
+            containers.append(ImageContainer(container_images, index=len(containers)))
+        return containers
+
+    def _create_container(self, container: ImageContainer, document_name):
+        word_file_path = config.word_dir_path / Path(f'{document_name}-{container.split}-{container.index}.docx')
+        try:
+            self.knowledge_base.add_images_to_word_file(container.images, word_file_path)
+            response = self.knowledge_base.api.create_document_by_file(self.knowledge_base.dataset_id, word_file_path)
+        except Exception as e:
+            print(f'Failed to create image container {word_file_path.name}: {e}')
+            return
+        if response.data is None:
+            return
+        container.document_id = response.data['document']['id']
+        container.indexing = self.knowledge_base.indexing_watcher.watch(response.data['batch'], container.document_id)
+
+    def _is_indexed(self, container: ImageContainer) -> bool:
+        if container.indexing is None:
+            return False
+        try:
+            container.indexing.result()
+        except IndexingNotCompletedError as e:
+            print(e)
+            return False
+        return True
+
+    def _resolve_file_ids(self, document_ids: list[str]) -> dict[str, list[str]]:
+        return {
+            document_id: self.knowledge_base._get_images_from_segments(segments)
+            for document_id, segments in self.knowledge_base.api.iter_segments_from_documents(
+                self.knowledge_base.dataset_id, document_ids
+            )
+        }
+
+    def _bisect(self, container: ImageContainer, document_name) -> list[ImageContainer]:
+        if container.split + 1 > self.max_split:
+            raise SplitCountExceeded(
+                f'Max split count of {self.max_split} exceeded for document {document_name} '
+                f'uploaded to {self.knowledge_base.dataset_name}'
+            )
+        return container.bisect()
+
+    def upload(self, images: list[Path], document_name) -> dict:
+        images_mapping = {}
+        document_ids = []
+        pending = self.group_images(images)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                while pending:
+                    list(executor.map(lambda container: self._create_container(container, document_name), pending))
+                    document_ids.extend(container.document_id for container in pending if container.document_id)
+                    indexed = [container for container in pending if self._is_indexed(container)]
+                    file_ids = self._resolve_file_ids([container.document_id for container in indexed])
+                    failed = []
+                    for container in pending:
+                        container_file_ids = file_ids.get(container.document_id, [])
+                        if container in indexed and len(container_file_ids) == len(container.images):
+                            images_mapping.update(zip(container.images, container_file_ids))
+                        elif len(container.images) == 1:
+                            print(f'Failed to upload image {container.images[0]}')
+                            images_mapping[container.images[0]] = ''
+                        else:
+                            failed.append(container)
+                    pending = [half for container in failed for half in self._bisect(container, document_name)]
+            finally:
+                list(executor.map(
+                    lambda document_id: self.knowledge_base.api.delete_document(
+                        self.knowledge_base.dataset_id, document_id
+                    ), document_ids
+                ))
+        print(f'Uploaded {sum(bool(file_id) for file_id in images_mapping.values())} of {len(images)} images '
+              f'through {len(document_ids)} containers to {self.knowledge_base.dataset_name}')
+        return images_mapping
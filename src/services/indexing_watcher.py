@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Optional
+
+from src.utils.config import config
+
+
+class IndexingNotCompletedError(Exception):
+    pass
+
+
+class IndexingMetrics(object):
+    def __init__(self):
+        self._records = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, dataset_id: str, wait_time: float):
+        with self._lock:
+            self._records[dataset_id].append(wait_time)
+
+    def get_summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            records = {dataset_id: list(values) for dataset_id, values in self._records.items()}
+        return {
+            dataset_id: {
+                'documents': len(values),
+                'total_wait_time': sum(values),
+                'avg_wait_time': sum(values) / len(values),
+                'max_wait_time': max(values),
+            } for dataset_id, values in records.items()
+        }
+
+    def print_summary(self):
+        for dataset_id, summary in self.get_summary().items():
+            print(f"Dataset '{dataset_id}': waited on indexing for {summary['documents']} documents, "
+                  f"total {summary['total_wait_time']:.1f}s, avg {summary['avg_wait_time']:.1f}s, "
+                  f"max {summary['max_wait_time']:.1f}s")
+
+
+indexing_metrics = IndexingMetrics()
+
+
+class IndexingWatcher(object):
+    FAILED_STATUSES = ('error',)
+
+    def __init__(self, api, dataset_id, min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 backoff_factor: Optional[float] = None, timeout: Optional[float] = None):
+        self.api = api
+        self.dataset_id = dataset_id
+        self.min_interval = min_interval or config.indexing_min_interval
+        self.max_interval = max_interval or config.indexing_max_interval
+        self.backoff_factor = backoff_factor or config.indexing_backoff_factor
+        self.timeout = timeout or config.indexing_timeout
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def watch(self, batch_id, document_id, status='completed') -> Future:
+        future = Future()
+        with self._lock:
+            self._pending.setdefault(batch_id, {})[document_id] = (future, status, time.monotonic())
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        return future
+
+    def wait(self, batch_id, document_id, status='completed'):
+        return self.watch(batch_id, document_id, status).result()
+
+    def _resolve(self, batch_id, document_id, error: Optional[Exception] = None):
+        with self._lock:
+            documents = self._pending.get(batch_id, {})
+            future, _, started = documents.pop(document_id)
+            if not documents:
+                self._pending.pop(batch_id, None)
+        indexing_metrics.record(self.dataset_id, time.monotonic() - started)
+        if future.done():
+            return
+        if error is None:
+            future.set_result(document_id)
+        else:
+            future.set_exception(error)
+
+    def _take_pending(self) -> Optional[dict]:
+        with self._lock:
+            if not self._pending:
+                self._worker = None
+                return None
+            return {batch_id: dict(documents) for batch_id, documents in self._pending.items()}
+
+    def _next_interval(self, interval: float, progressed: bool) -> float:
+        return self.min_interval if progressed else min(interval * self.backoff_factor, self.max_interval)
+
+    def _apply_statuses(self, batch_id, documents: dict, statuses: Optional[dict]) -> bool:
+        statuses = statuses or {}
+        now = time.monotonic()
+        progressed = False
+        for document_id, (_, status, started) in documents.items():
+            document_status = statuses.get(document_id, '')
+            if document_status == status:
+                self._resolve(batch_id, document_id)
+                progressed = True
+            elif document_status in self.FAILED_STATUSES:
+                self._resolve(batch_id, document_id, IndexingNotCompletedError(
+                    f'Indexing failed with status "{document_status}" for document_id: {document_id}'))
+                progressed = True
+            elif now - started > self.timeout:
+                self._resolve(batch_id, document_id, IndexingNotCompletedError(
+                    f'Indexing not completed after {self.timeout} seconds for document_id: {document_id}'))
+        return progressed
+
+    def _poll_batch(self, batch_id, documents: dict) -> bool:
+        return self._apply_statuses(batch_id, documents, self.api.get_indexing_status(self.dataset_id, batch_id))
+
+    def _run(self):
+        interval = self.min_interval
+        while True:
+            batches = self._take_pending()
+            if batches is None:
+                return
+            progressed = False
+            for batch_id, documents in batches.items():
+                try:
+                    progressed = self._poll_batch(batch_id, documents) or progressed
+                except Exception as e:
+                    print(f'Failed to poll indexing status of batch {batch_id}: {e}')
+            interval = self._next_interval(interval, progressed)
+            time.sleep(interval)
+
+
+class AsyncIndexingWatcher(IndexingWatcher):
+    def watch(self, batch_id, document_id, status='completed') -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._pending.setdefault(batch_id, {})[document_id] = (future, status, time.monotonic())
+            if self._worker is None or self._worker.done():
+                self._worker = asyncio.create_task(self._run())
+        return future
+
+    async def wait(self, batch_id, document_id, status='completed'):
+        return await self.watch(batch_id, document_id, status)
+
+    async def _poll_batch(self, batch_id, documents: dict) -> bool:
+        statuses = await self.api.get_indexing_status(self.dataset_id, batch_id)
+        return self._apply_statuses(batch_id, documents, statuses)
+
+    async def _run(self):
+        interval = self.min_interval
+        while True:
+            batches = self._take_pending()
+            if batches is None:
+                return
+            results = await asyncio.gather(*(
+                self._poll_batch(batch_id, documents) for batch_id, documents in batches.items()
+            ), return_exceptions=True)
+            for batch_id, result in zip(batches, results):
+                if isinstance(result, Exception):
+                    print(f'Failed to poll indexing status of batch {batch_id}: {result}')
+            interval = self._next_interval(interval, any(result is True for result in results))
+            await asyncio.sleep(interval)
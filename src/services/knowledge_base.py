@@ -1,9 +1,9 @@
-import random
 import re
-import time
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union, Optional
+from typing import Iterator, Union, Optional
 
 import pandas as pd
 from PIL import Image
@@ -13,20 +13,19 @@ from docx.image.exceptions import UnrecognizedImageError
 from src.api.dataset_api import DatasetApi
 from src.database.dify_database import DifyDatabase
 from src.database.record_database import RecordDatabase
+from src.services.document_diff import SegmentDiff, diff_segments
+from src.services.image_uploader import ImageUploader, SplitCountExceeded
+from src.services.indexing_watcher import IndexingWatcher
+from src.services.sync_state import SyncStateStore
 from src.utils.config import config
 from src.utils.document_sync_config import DocumentSyncConfig
+from src.utils.hash_calculator import HashCalculator
 from src.utils.time_utils import timing
 
 
-class IndexingNotCompletedError(Exception):
-    pass
-
-
-class SplitCountExceeded(Exception):
-    pass
-
-
 class KnowledgeBase(object):
+    IMAGE_HASH_ALGORITHM = 'sha256'
+
     def __init__(self, env, dataset_id, dataset_name, api: DatasetApi,
                  db: DifyDatabase = None, record_db: RecordDatabase = None):
         self.env = env
@@ -35,6 +34,10 @@ class KnowledgeBase(object):
         self.api = api
         self.db = db
         self.record_db = record_db
+        self.indexing_watcher = IndexingWatcher(api, dataset_id)
+        self.sync_state = None
+        if record_db is not None and config.sync_state_enabled:
+            self.sync_state = SyncStateStore(env, dataset_id, record_db, db)
 
     def record_knowledge_base_info(self):
         if not self.record_db:
@@ -45,32 +48,20 @@ class KnowledgeBase(object):
     def record_documents(self, documents):
         if not self.record_db:
             raise Exception('Record database is not set')
-        docs_in_record = self.fetch_documents(source='record', with_segment=True)
-        if docs_in_record is not None:
-            docs_to_remove_in_record = [doc for doc in docs_in_record if
-                                        doc['id'] not in [document['id'] for document in documents]]
-            if docs_to_remove_in_record:
-                self.record_db.remove_documents([doc['id'] for doc in docs_to_remove_in_record])
         modified_documents = [
             {k: (self.dataset_id if k == 'dataset_id' else v) for k, v in document.items() if k != 'segment'}
             for document in documents
         ]
-        self.record_db.save_documents(modified_documents)
+        segments = {}
         for document in documents:
             if 'segment' not in document:
                 continue
-            segment_ids = [segment['id'] for segment in document['segment']]
-            segment_ids_in_record = [segment['id'] for segment in self._fetch_segments('record', document['id'])]
-            segments_to_remove_in_record = [segment_id for segment_id in segment_ids_in_record if
-                                            segment_id not in segment_ids]
-            if segments_to_remove_in_record:
-                self.record_db.remove_segments(document['id'], segments_to_remove_in_record)
-            for segment in document['segment']:
-                keywords = segment['keywords']
-                if isinstance(keywords, list):
-                    keywords.sort()
-                    segment['keywords'] = ','.join(keywords)
-            self.record_db.save_segments(document['segment'])
+            segments[document['id']] = [
+                {**segment, 'keywords': ','.join(sorted(segment['keywords']))}
+                if isinstance(segment['keywords'], list) else segment
+                for segment in document['segment']
+            ]
+        self.record_db.reconcile_documents(self.dataset_id, modified_documents, segments)
 
     def _fetch_all_documents(self, source, is_enabled: bool):
         if source == 'api':
@@ -86,11 +77,20 @@ class KnowledgeBase(object):
         else:
             return None
 
-    def _find_document_by_id(self, documents, document_id):
-        for document in documents:
-            if document['id'] == document_id:
-                return document
-        return None
+    def _fetch_documents_by_ids(self, source, document_ids: list[str], is_enabled: bool = None):
+        if source == 'api':
+            return self.api.get_documents(self.dataset_id, document_ids, is_enabled)
+        elif source == 'db':
+            if self.db is None:
+                raise Exception('Dify database is not set')
+            return self.db.get_documents_by_ids(self.dataset_id, document_ids, is_enabled=is_enabled)
+        elif source == 'record':
+            return self.record_db.get_documents(
+                self.api.base_url, self.dataset_id, with_segment=False, is_enabled=is_enabled,
+                document_ids=document_ids
+            )
+        else:
+            return None
 
     def _get_images_from_segments(self, segments):
         pattern = r'(?:!\[image\])?\([^)]*/files/(.*?)/(?:image-preview|file-preview)\)'
@@ -111,6 +111,17 @@ class KnowledgeBase(object):
             return self.record_db.get_segments(document_id)
         return None
 
+    def _fetch_segments_by_document_ids(self, source, document_ids: list[str]) -> dict[str, list[dict]]:
+        if source == 'api':
+            return dict(self.api.iter_segments_from_documents(self.dataset_id, document_ids))
+        elif source == 'db':
+            if self.db is None:
+                raise Exception('Dify database is not set')
+            return self.db.get_segments_by_document_ids(document_ids)
+        elif source == 'record':
+            return self.record_db.get_segments_by_document_ids(document_ids)
+        return {}
+
     def _process_document(self, document, source, with_segment, with_image):
         document['dataset_id'] = self.dataset_id
         if with_segment:
@@ -118,22 +129,61 @@ class KnowledgeBase(object):
         if with_image and 'segment' in document:
             document['image'] = self._get_images_from_segments(document['segment'])
 
-    def fetch_documents(self, source, document_id=None, with_segment=False, with_image=False,
-                        is_enabled: bool = None) -> Optional[Union[dict, list[dict]]]:
-        documents = self._fetch_all_documents(source, is_enabled)
-        if documents is None or not documents:
-            return None
+    def iter_documents(self, source, with_segment=False, with_image=False,
+                       is_enabled: bool = None) -> Iterator[dict]:
+        if source == 'api' and with_segment:
+            yield from self._iter_api_documents_with_segments(with_image, is_enabled)
+            return
+        if source == 'db' and with_segment:
+            if self.db is None:
+                raise Exception('Dify database is not set')
+            for document in self.db.iter_documents(self.dataset_id, with_segment=True, is_enabled=is_enabled):
+                self._process_document(document, source, False, with_image)
+                yield document
+            return
+        if source == 'api':
+            documents = self.api.iter_documents_in_dataset(self.dataset_id, is_enabled)
+        else:
+            documents = self._fetch_all_documents(source, is_enabled) or []
+        for document in documents:
+            self._process_document(document, source, with_segment, with_image)
+            yield document
+
+    def _iter_api_documents_with_segments(self, with_image=False, is_enabled: bool = None) -> Iterator[dict]:
+        pending_documents = deque()
 
+        def document_ids():
+            for document in self.api.iter_documents_in_dataset(self.dataset_id, is_enabled):
+                pending_documents.append(document)
+                yield document['id']
+
+        for _, segments in self.api.iter_segments_from_documents(self.dataset_id, document_ids()):
+            document = pending_documents.popleft()
+            document['segment'] = segments
+            self._process_document(document, 'api', False, with_image)
+            yield document
+
+    def fetch_documents(self, source, document_id=None, with_segment=False, with_image=False,
+                        is_enabled: bool = None, document_ids: list[str] = None) -> Optional[Union[dict, list[dict]]]:
         if document_id:
-            document = self._find_document_by_id(documents, document_id)
-            if document:
-                self._process_document(document, source, with_segment, with_image)
-                return document
-            return None
-        else:
+            documents = self.fetch_documents(source, with_segment=with_segment, with_image=with_image,
+                                             is_enabled=is_enabled, document_ids=[document_id])
+            return documents[0] if documents else None
+        if document_ids is None:
+            return list(self.iter_documents(source, with_segment, with_image, is_enabled)) or None
+
+        document_ids = list(dict.fromkeys(document_ids))
+        documents = {
+            document['id']: document for document in self._fetch_documents_by_ids(source, document_ids, is_enabled) or []
+        }
+        documents = [documents[document_id] for document_id in document_ids if document_id in documents]
+        if with_segment:
+            segments = self._fetch_segments_by_document_ids(source, [document['id'] for document in documents])
             for document in documents:
-                self._process_document(document, source, with_segment, with_image)
-            return documents
+                document['segment'] = segments.get(document['id'], [])
+        for document in documents:
+            self._process_document(document, source, False, with_image)
+        return documents
 
     def get_document_id_by_name(self, name, documents):
         if documents is not None:
@@ -150,33 +200,124 @@ class KnowledgeBase(object):
             if 'segment' in doc:
                 doc['segment'] = self._handle_and_sort_text(doc['segment'], sync_config.preserve_segment_order)
 
-        current_documents, existing_ids, extra_ids = self._fetch_and_filter_current_documents(documents)
+        unchanged_mapping = {}
+        if self.sync_state is not None:
+            if self.sync_state.needs_reconcile():
+                self.sync_state.reconcile()
+            unchanged_mapping = self.sync_state.get_unchanged(documents)
+            for doc_name in unchanged_mapping:
+                print(f'Skip unchanged document: {doc_name}')
+        all_documents = documents
+        documents = [doc for doc in documents if doc['name'] not in unchanged_mapping]
+        if not documents and not sync_config.remove_extra:
+            return unchanged_mapping
+
+        current_documents, existing_ids, extra_ids = self._fetch_and_filter_current_documents(
+            all_documents, unchanged_mapping
+        )
+        docs_name_id_mapping = dict(unchanged_mapping)
 
         if sync_config.skip_existing:
             existing_doc_names = {doc['name'] for doc in current_documents if doc['id'] in existing_ids}
             documents = [doc for doc in documents if doc['name'] not in existing_doc_names]
             for doc_name in existing_doc_names:
                 print(f'Skip existing document: {doc_name}')
-        else:
-            if sync_config.replace_existing and existing_ids:
-                if sync_config.backup:
-                    self.backup_documents(document_ids=existing_ids, source=source)
-                self.delete_documents(existing_ids)
-        if sync_config.remove_extra and extra_ids:
+        elif sync_config.replace_existing and existing_ids and sync_config.diff_existing:
+            docs_name_id_mapping.update(self._diff_existing_documents(
+                documents, current_documents, existing_ids, sync_config, source
+            ))
+        elif sync_config.replace_existing and existing_ids:
             if sync_config.backup:
                 self.backup_documents(document_ids=existing_ids, source=source)
+            self.delete_documents(existing_ids)
+        if sync_config.remove_extra and extra_ids:
+            if sync_config.backup:
+                self.backup_documents(document_ids=extra_ids, source=source)
             self.delete_documents(extra_ids)
 
-        return self.create_document_by_text(documents)
+        docs_name_id_mapping.update(self.create_document_by_text(
+            [document for document in documents if document['name'] not in docs_name_id_mapping],
+            preserve_order=sync_config.preserve_document_order, max_workers=sync_config.max_workers
+        ))
+        if self.sync_state is not None:
+            self.sync_state.record(documents, docs_name_id_mapping)
+        return {
+            document['name']: docs_name_id_mapping[document['name']]
+            for document in all_documents if document['name'] in docs_name_id_mapping
+        }
+
+    def _diff_existing_documents(self, documents: list[dict], current_documents: list[dict], existing_ids: list[str],
+                                 sync_config: DocumentSyncConfig, source: str = 'api') -> dict:
+        current_ids_by_name = {}
+        for document in current_documents:
+            if document['id'] in existing_ids:
+                current_ids_by_name.setdefault(document['name'], document['id'])
+        duplicate_ids = [document_id for document_id in existing_ids if document_id not in current_ids_by_name.values()]
+        if duplicate_ids:
+            if sync_config.backup:
+                self.backup_documents(document_ids=duplicate_ids, source=source)
+            self.delete_documents(duplicate_ids)
 
-    def _wait_document_embedding(self, batch_id, document_id, status='completed', retry: int = 600):
-        index = 0
-        while self.api.get_document_embedding_status(self.dataset_id, batch_id, document_id) != status:
-            if index == retry:
-                raise IndexingNotCompletedError(
-                    f'Indexing not completed after {retry} attempts for document_id: {document_id}')
-            index += 1
-            time.sleep(0.5)
+        documents_by_id = {}
+        for document in documents:
+            document_id = current_ids_by_name.get(document['name'])
+            if document_id is not None and document_id not in documents_by_id:
+                documents_by_id[document_id] = document
+        diffs = {
+            document_id: diff_segments(current_segments, documents_by_id[document_id].get('segment', []))
+            for document_id, current_segments in self.api.iter_segments_from_documents(
+                self.dataset_id, list(documents_by_id)
+            )
+        }
+        reordered_ids = [
+            document_id for document_id, diff in diffs.items()
+            if sync_config.preserve_segment_order and not diff.in_order
+        ]
+        changed_ids = [
+            document_id for document_id, diff in diffs.items() if diff.changed and document_id not in reordered_ids
+        ]
+        if sync_config.backup and (changed_ids or reordered_ids):
+            self.backup_documents(document_ids=changed_ids + reordered_ids, source=source)
+        if reordered_ids:
+            self.delete_documents(reordered_ids)
+        with ThreadPoolExecutor(max_workers=max(sync_config.max_workers, 1)) as executor:
+            futures = [
+                executor.submit(self._apply_segment_diff, document_id, diffs[document_id]) for document_id in changed_ids
+            ]
+            for future in futures:
+                future.result()
+
+        for document_id, diff in diffs.items():
+            if document_id in reordered_ids:
+                print(f"Document '{documents_by_id[document_id]['name']}': recreated to preserve segment order")
+                continue
+            print(f"Document '{documents_by_id[document_id]['name']}': {len(diff.unchanged)} unchanged, "
+                  f"{len(diff.updated)} updated, {len(diff.created)} created, {len(diff.deleted)} deleted segments")
+        embeddings_avoided = sum(
+            diff.embeddings_avoided for document_id, diff in diffs.items() if document_id not in reordered_ids
+        )
+        print(f"Dataset '{self.dataset_name}': {len(diffs) - len(changed_ids) - len(reordered_ids)} of {len(diffs)} "
+              f"existing documents unchanged, {len(reordered_ids)} recreated, "
+              f"{embeddings_avoided} segment embeddings avoided")
+        return {
+            document['name']: document_id for document_id, document in documents_by_id.items()
+            if document_id not in reordered_ids
+        }
+
+    def _apply_segment_diff(self, document_id, diff: SegmentDiff):
+        if diff.updated:
+            self.api.update_segments_in_document(self.dataset_id, document_id, [
+                {**segment, 'id': current_segment['id'], 'answer': segment.get('answer', ''),
+                 'enabled': bool(segment.get('enabled'))}
+                for current_segment, segment in diff.updated
+            ])
+        if diff.created:
+            self._create_segments(document_id, diff.created)
+        for segment in diff.deleted:
+            self.api.delete_segment(self.dataset_id, document_id, segment['id'])
+
+    def _wait_document_embedding(self, batch_id, document_id, status='completed'):
+        self.indexing_watcher.wait(batch_id, document_id, status)
 
     def create_document_by_file(self, file_path):
         response = self.api.create_document_by_file(self.dataset_id, file_path)
@@ -191,6 +332,8 @@ class KnowledgeBase(object):
         for document_id in document_ids:
             if document_id:
                 self.api.delete_document(self.dataset_id, document_id)
+        if self.sync_state is not None:
+            self.sync_state.forget(document_ids)
 
     def update_segment_in_document(self, segment):
         self.api.update_segment_in_document(
@@ -207,53 +350,40 @@ class KnowledgeBase(object):
         documents = self.api.get_documents_in_dataset(self.dataset_id)
         for document in documents:
             self.api.delete_document(self.dataset_id, document['id'])
+        if self.sync_state is not None:
+            self.sync_state.forget([document['id'] for document in documents])
+
+    def _get_cached_image_uploads(self, image_hashes: list[str]) -> dict[str, str]:
+        if self.record_db is None:
+            return {}
+        cached = self.record_db.get_image_uploads(self.env, image_hashes, self.IMAGE_HASH_ALGORITHM)
+        if cached and self.db is not None:
+            existing_file_ids = self.db.get_existing_upload_file_ids(list(set(cached.values())))
+            cached = {hash_value: file_id for hash_value, file_id in cached.items() if file_id in existing_file_ids}
+        return cached
 
     def upload_images(self, images_path: list, doc_name: str = uuid.uuid4()) -> dict:
-        images_mapping = {}
-
-        docs_with_images = self.upload_images_by_word_file(doc_name, images_path)
-        images = []
-        for document_id in docs_with_images:
-            if document_id == '':
-                images.append('')
-            else:
-                document = self.fetch_documents('api', document_id=document_id, with_segment=True, with_image=True)
-                images.extend(document['image'])
-        images_mapping.update(dict(zip(images_path, images)))
-        self.delete_documents(docs_with_images)
-
-        return images_mapping
-
-    def upload_images_by_word_file(self, document_name, images, split_count=1, current_split=1, max_split=5) -> list:
-        def split_list(lst, count):
-            k, m = divmod(len(lst), count)
-            return [lst[i * k + min(i, m):(i + 1) * k + min(i + 1, m)] for i in range(count)]
-
-        if current_split > max_split:
-            raise SplitCountExceeded(
-                f'Max split count of {max_split} exceeded for document {document_name} uploaded to {self.dataset_name}'
-            )
-
-        uploaded_documents = []
-        split_image_paths = split_list(images, split_count)
-        for batch_index, image_batch in enumerate(split_image_paths):
-            if image_batch:
-                word_file_path = config.word_dir_path / Path(f'{document_name}-{current_split}-{batch_index}.docx')
-                self.add_images_to_word_file(image_batch, word_file_path)
-                document_id = self.create_document_by_file(word_file_path)
-                if document_id is not None:
-                    uploaded_documents.append(document_id)
-                else:
-                    if len(image_batch) == 1:
-                        uploaded_documents.append('')
-                    else:
-                        uploaded_documents.extend(
-                            self.upload_images_by_word_file(
-                                document_name, image_batch, split_count * 2, current_split + 1, max_split
-                            )
-                        )
-            time.sleep(random.uniform(1, 3))
-        return uploaded_documents
+        hash_calculator = HashCalculator(self.IMAGE_HASH_ALGORITHM)
+        image_hashes = {image_path: hash_calculator.calculate_file_hash(image_path) for image_path in images_path}
+        file_ids = self._get_cached_image_uploads(list(set(image_hashes.values())))
+        images_to_upload = list({
+            image_hashes[image_path]: image_path for image_path in images_path if image_hashes[image_path] not in file_ids
+        }.values())
+        print(f'Uploading {len(images_to_upload)} new images, '
+              f'{sum(image_hashes[image_path] in file_ids for image_path in images_path)} of {len(images_path)} '
+              f'found in upload cache')
+        if images_to_upload:
+            uploaded = {
+                image_hashes[image_path]: file_id
+                for image_path, file_id in self._upload_images(images_to_upload, doc_name).items() if file_id
+            }
+            if uploaded and self.record_db is not None:
+                self.record_db.save_image_uploads(self.env, uploaded, self.IMAGE_HASH_ALGORITHM)
+            file_ids.update(uploaded)
+        return {image_path: file_ids.get(image_hashes[image_path], '') for image_path in images_path}
+
+    def _upload_images(self, images_path: list, doc_name: str) -> dict:
+        return ImageUploader(self).upload(images_path, doc_name)
 
     def add_images_to_word_file(self, images: list[Path], word_file: Path):
         doc = Document()
@@ -280,47 +410,59 @@ class KnowledgeBase(object):
             return sorted(text, key=lambda x: x['position'])
         return text
 
-    def _fetch_and_filter_current_documents(self, documents):
+    def _fetch_and_filter_current_documents(self, documents, unchanged_mapping: dict = None):
+        unchanged_mapping = unchanged_mapping or {}
         current_documents = self.fetch_documents(source='db') or []
         document_names = {document['name'] for document in documents}
-        existing_ids = [doc['id'] for doc in current_documents if doc['name'] in document_names]
+        existing_ids = [
+            doc['id'] for doc in current_documents
+            if doc['name'] in document_names and unchanged_mapping.get(doc['name']) != doc['id']
+        ]
         extra_ids = [doc['id'] for doc in current_documents if doc['name'] not in document_names]
         return current_documents, existing_ids, extra_ids
 
-    def create_document_by_text(self, documents: list[dict]) -> dict:
-        docs_name_id_mapping = {}
-        for document in documents:
-            document_id, batch_id = self.api.create_document(self.dataset_id, document['name'])
-            self._wait_document_embedding(batch_id, document_id)
-            if 'segment' in document:
-                segments = document['segment']
-                for segment in segments:
-                    segment_id = self.api.create_segment_in_document(self.dataset_id, document_id, segment)
-                    if not segment.get('enabled'):
-                        self.api.update_segment_in_document(
-                            self.dataset_id, document_id, segment_id, segment.get('content'), segment.get('answer'),
-                            segment.get('keywords'), False
-                        )
-            docs_name_id_mapping[document['name']] = document_id
-        return docs_name_id_mapping
+    def _populate_document(self, document: dict, document_id, batch_id) -> str:
+        self._wait_document_embedding(batch_id, document_id)
+        if 'segment' in document:
+            self._create_segments(document_id, document['segment'])
+        return document_id
 
-    def get_image_paths(self, image_uuids: list[str]):
-        image_paths = {}
+    def _create_and_populate_document(self, document: dict) -> str:
+        document_id, batch_id = self.api.create_document(self.dataset_id, document['name'])
+        return self._populate_document(document, document_id, batch_id)
+
+    def create_document_by_text(self, documents: list[dict], preserve_order: bool = True, max_workers: int = 4) -> dict:
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            if preserve_order:
+                futures = []
+                for document in documents:
+                    document_id, batch_id = self.api.create_document(self.dataset_id, document['name'])
+                    futures.append(executor.submit(self._populate_document, document, document_id, batch_id))
+            else:
+                futures = [executor.submit(self._create_and_populate_document, document) for document in documents]
+            document_ids = [future.result() for future in futures]
+        return {document['name']: document_id for document, document_id in zip(documents, document_ids)}
+
+    def _create_segments(self, document_id, segments: list[dict]) -> list[str]:
+        if not segments:
+            return []
+        segment_ids = self.api.create_segments_in_document(self.dataset_id, document_id, segments)
+        disabled_segments = [
+            {**segment, 'id': segment_id, 'enabled': False}
+            for segment, segment_id in zip(segments, segment_ids) if not segment.get('enabled')
+        ]
+        if disabled_segments:
+            self.api.update_segments_in_document(self.dataset_id, document_id, disabled_segments)
+        return segment_ids
 
-        for image_uuid in image_uuids:
-            image_path = self.db.get_image_path(image_uuid)
-            if image_path is None:
-                continue
-            image_paths[image_uuid] = image_path
-        return image_paths
+    def get_image_paths(self, image_uuids: list[str]):
+        return self.db.get_image_paths(image_uuids)
 
     def backup_documents(self, document_ids: list[str], source: str = 'api'):
-        documents = []
-        for doc_id in document_ids:
-            document = self.fetch_documents(source=source, document_id=doc_id, with_segment=True)
-            if document is None:
-                continue
-            documents.append(document)
+        documents = self.fetch_documents(source=source, with_segment=True, document_ids=document_ids)
+        missing_ids = {str(document_id) for document_id in document_ids} - {str(doc['id']) for doc in documents}
+        if missing_ids:
+            raise ValueError(f'Failed to fetch documents {sorted(missing_ids)} from {source} for backup')
         rows = []
         for doc in documents:
             for segment in doc['segment']:
@@ -337,12 +479,7 @@ class KnowledgeBase(object):
         self.record_db.backup_documents(documents=documents_df)
 
     def disable_documents(self, document_ids: list[str], source: str = 'api'):
-        documents = []
-        for doc_id in document_ids:
-            document = self.fetch_documents(source=source, document_id=doc_id, with_segment=True)
-            if document is None:
-                continue
-            documents.append(document)
+        documents = self.fetch_documents(source=source, with_segment=True, document_ids=document_ids)
         for doc in documents:
             for segment in doc['segment']:
                 if not segment.get('enabled'):
@@ -350,3 +487,5 @@ class KnowledgeBase(object):
                 segment['enabled'] = False
                 self.update_segment_in_document(segment)
             print(f'Disabled document: {doc["name"]}')
+        if self.sync_state is not None:
+            self.sync_state.forget(document_ids)
@@ -1,26 +1,52 @@
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+
+from src.utils.config import config
+from src.utils.hash_calculator import HashCalculator
 
 
 class S3Handler(object):
-    def __init__(self, aws_access_key_id, aws_secret_access_key, region_name, bucket_name):
+    CACHE_FILE_NAME = '.s3_download_cache.json'
+
+    def __init__(self, aws_access_key_id, aws_secret_access_key, region_name, bucket_name, endpoint_url=None,
+                 client=None):
         self.bucket_name = bucket_name
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=region_name,
+        self.max_workers = config.s3_max_workers
+        self.list_threshold = config.s3_list_threshold
+        self.transfer_config = TransferConfig(
+            multipart_threshold=config.s3_multipart_threshold,
+            multipart_chunksize=config.s3_multipart_chunksize,
+            max_concurrency=config.s3_max_concurrency,
         )
-        self.s3 = session.client('s3')
+        if client is None:
+            session = boto3.Session(
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                region_name=region_name,
+            )
+            client = session.client('s3', endpoint_url=endpoint_url, config=BotoConfig(
+                max_pool_connections=config.s3_max_workers * config.s3_max_concurrency
+            ))
+        self.s3 = client
 
-    def download_file(self, key, local_dir):
+    def download_file(self, key, local_dir) -> bool:
         try:
             local_dir_path = Path(local_dir)
             local_dir_path.mkdir(parents=True, exist_ok=True)
-            self.s3.download_file(self.bucket_name, key, Path(local_dir) / Path(key).name)
+            self.s3.download_file(self.bucket_name, key, Path(local_dir) / Path(key).name, Config=self.transfer_config)
             print(f'download file "{key}" to "{local_dir}" successfully')
+            return True
         except Exception as e:
             print(f'download file "{key}" to "{local_dir}" failed: {e}')
+            return False
 
     def list_files(self, prefix):
         response = self.s3.list_objects_v2(Bucket=self.bucket_name, Prefix=prefix)
@@ -29,13 +55,115 @@ class S3Handler(object):
             return []
         return [file['Key'] for file in response.get('Contents', [])]
 
-    def find_and_download_file(self, file, local_dir, skip_if_exists=False) -> bool:
-        files = self.list_files(file)
-        if file in files:
-            local_file_path = Path(local_dir) / Path(file).name
-            if skip_if_exists and local_file_path.exists():
-                return True
+    def list_objects(self, prefix) -> dict[str, dict]:
+        objects = {}
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for item in page.get('Contents', []):
+                objects[item['Key']] = {'etag': item['ETag'].strip('"'), 'size': item['Size']}
+        return objects
+
+    def head_object(self, key) -> Optional[dict]:
+        try:
+            response = self.s3.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {'etag': response['ETag'].strip('"'), 'size': response['ContentLength']}
+
+    def get_objects_metadata(self, keys: list[str], executor: ThreadPoolExecutor) -> dict[str, dict]:
+        keys_by_prefix = defaultdict(list)
+        for key in keys:
+            keys_by_prefix[key.rpartition('/')[0]].append(key)
+        metadata = {}
+        head_keys = []
+        for prefix, prefix_keys in keys_by_prefix.items():
+            if prefix and len(prefix_keys) >= self.list_threshold:
+                objects = self.list_objects(f'{prefix}/')
+                metadata.update({key: objects[key] for key in prefix_keys if key in objects})
             else:
-                self.download_file(file, local_dir)
-                return True
+                head_keys.extend(prefix_keys)
+        for key, object_metadata in zip(head_keys, executor.map(self.head_object, head_keys)):
+            if object_metadata is not None:
+                metadata[key] = object_metadata
+        return metadata
+
+    def _load_cache(self, local_dir: Path) -> dict:
+        cache_file = local_dir / self.CACHE_FILE_NAME
+        if not cache_file.exists():
+            return {}
+        try:
+            return json.loads(cache_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            print(f'ignore unreadable download cache "{cache_file}": {e}')
+            return {}
+
+    def _save_cache(self, local_dir: Path, cache: dict):
+        cache_file = local_dir / self.CACHE_FILE_NAME
+        cache_file.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    @staticmethod
+    def _is_up_to_date(local_file_path: Path, object_metadata: dict, cached: Optional[dict]) -> bool:
+        if not local_file_path.exists():
+            return False
+        stat = local_file_path.stat()
+        if stat.st_size != object_metadata['size']:
+            return False
+        if cached and cached.get('etag') == object_metadata['etag'] and cached.get('mtime') == stat.st_mtime:
+            return True
+        if '-' not in object_metadata['etag']:
+            return HashCalculator('md5').calculate_file_hash(local_file_path) == object_metadata['etag']
         return False
+
+    def download_files(self, keys: list[str], local_dir, skip_if_exists=False) -> dict[str, Path]:
+        local_dir = Path(local_dir)
+        local_dir.mkdir(parents=True, exist_ok=True)
+        keys = list(dict.fromkeys(keys))
+        cache = self._load_cache(local_dir)
+        downloaded = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            metadata = self.get_objects_metadata(keys, executor)
+            keys_to_download = []
+            for key, object_metadata in metadata.items():
+                local_file_path = local_dir / Path(key).name
+                if skip_if_exists and self._is_up_to_date(
+                        local_file_path, object_metadata, cache.get(local_file_path.name)):
+                    downloaded[key] = local_file_path
+                else:
+                    keys_to_download.append(key)
+            skipped = len(downloaded)
+            for key, is_downloaded in zip(
+                    keys_to_download, executor.map(lambda key: self.download_file(key, local_dir), keys_to_download)):
+                if is_downloaded:
+                    downloaded[key] = local_dir / Path(key).name
+        for key, local_file_path in downloaded.items():
+            cache[local_file_path.name] = {
+                'key': key,
+                'etag': metadata[key]['etag'],
+                'size': metadata[key]['size'],
+                'mtime': local_file_path.stat().st_mtime,
+            }
+        self._save_cache(local_dir, cache)
+        print(f'downloaded {len(downloaded) - skipped} files to "{local_dir}", {skipped} up to date, '
+              f'{len(keys) - len(metadata)} not found in "{self.bucket_name}"')
+        return downloaded
+
+    def find_and_download_file(self, file, local_dir, skip_if_exists=False) -> bool:
+        return file in self.download_files([file], local_dir, skip_if_exists)
+
+    def copy_from(self, source: 'S3Handler', key, target_key=None) -> bool:
+        target_key = target_key or key
+        try:
+            self.s3.copy({'Bucket': source.bucket_name, 'Key': key}, self.bucket_name, target_key,
+                         SourceClient=source.s3, Config=self.transfer_config)
+            return True
+        except Exception as e:
+            print(f'server-side copy of "{key}" from "{source.bucket_name}" failed, streaming instead: {e}')
+        try:
+            body = source.s3.get_object(Bucket=source.bucket_name, Key=key)['Body']
+            self.s3.upload_fileobj(body, self.bucket_name, target_key, Config=self.transfer_config)
+            return True
+        except Exception as e:
+            print(f'copy file "{key}" from "{source.bucket_name}" to "{self.bucket_name}" failed: {e}')
+            return False
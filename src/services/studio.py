@@ -16,7 +16,7 @@ class Studio(object):
             self.app_apis = SimpleNamespace()
             for app in self.apps:
                 app_token = getattr(self.api_config, f'{app}_app_token')
-                setattr(self.app_apis, app, AppApi(self.api_config.url, app_token))
+                setattr(self.app_apis, app, AppApi(self.api_config.url, app_token, self.api_config.env))
             self._register_apps()
 
     def get_app(self, app_name: str):
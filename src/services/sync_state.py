@@ -0,0 +1,121 @@
+import datetime
+from typing import Optional
+
+from src.database.dify_database import DifyDatabase
+from src.database.record_database import RecordDatabase
+from src.services.document_diff import document_hash, input_segment_hash, segments_match
+from src.utils.config import config
+
+
+class SyncStateStore(object):
+    def __init__(self, env, dataset_id, record_db: RecordDatabase, db: Optional[DifyDatabase] = None,
+                 reconcile_interval: Optional[float] = None):
+        self.env = env
+        self.dataset_id = dataset_id
+        self.record_db = record_db
+        self.db = db
+        self.reconcile_interval = datetime.timedelta(
+            seconds=reconcile_interval if reconcile_interval is not None else config.sync_state_reconcile_interval
+        )
+        self._states = None
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now(tz=datetime.timezone(datetime.timedelta(hours=8))).replace(tzinfo=None)
+
+    @property
+    def states(self) -> dict[str, dict]:
+        if self._states is None:
+            self._states = {
+                state['document_name']: state
+                for state in self.record_db.get_sync_states(self.env, self.dataset_id)
+            }
+        return self._states
+
+    def get_unchanged(self, documents: list[dict]) -> dict:
+        unchanged = {}
+        for document in documents:
+            state = self.states.get(document['name'])
+            if state is not None and state['content_hash'] == document_hash(document):
+                unchanged[document['name']] = state['document_id']
+        if unchanged and self.db is not None:
+            existing_ids = self.db.get_existing_document_ids(self.dataset_id, list(unchanged.values()), is_enabled=True)
+            missing_ids = [document_id for document_id in unchanged.values() if document_id not in existing_ids]
+            if missing_ids:
+                print(f"Sync state of dataset '{self.dataset_id}' points to {len(missing_ids)} missing documents")
+                self.forget(missing_ids)
+                unchanged = {name: document_id for name, document_id in unchanged.items() if document_id in existing_ids}
+        return unchanged
+
+    def record(self, documents: list[dict], docs_name_id_mapping: dict):
+        now = self._now()
+        states = []
+        for document in documents:
+            document_id = docs_name_id_mapping.get(document['name'])
+            if document_id is None:
+                continue
+            previous = self.states.get(document['name'], {})
+            states.append({
+                'environment': self.env,
+                'dataset_id': self.dataset_id,
+                'document_name': document['name'],
+                'document_id': document_id,
+                'content_hash': document_hash(document),
+                'segment_hashes': [input_segment_hash(segment) for segment in document.get('segment', [])],
+                'synced_on': now,
+                'reconciled_on': previous.get('reconciled_on') or now,
+            })
+        if not states:
+            return
+        self.record_db.save_sync_states(states)
+        self.states.update({state['document_name']: state for state in states})
+
+    def forget(self, document_ids: list[str]):
+        document_ids = set(document_ids)
+        document_names = [name for name, state in self.states.items() if state['document_id'] in document_ids]
+        if not document_names:
+            return
+        self.record_db.remove_sync_states(self.env, self.dataset_id, document_names)
+        for name in document_names:
+            self.states.pop(name, None)
+
+    def needs_reconcile(self) -> bool:
+        if self.db is None or not self.states:
+            return False
+        oldest = min(state['reconciled_on'] or datetime.datetime.min for state in self.states.values())
+        return self._now() - oldest >= self.reconcile_interval
+
+    def reconcile(self):
+        if self.db is None:
+            raise Exception('Dify database is not set')
+        current_documents = {
+            document['id']: document for document in self.db.get_documents(self.dataset_id, with_segment=True)
+        }
+        now = self._now()
+        drifted_names = []
+        states = []
+        for name, state in self.states.items():
+            document = current_documents.get(state['document_id'])
+            if document is None or document['name'] != name or not segments_match(
+                    document.get('segment', []), state['segment_hashes'] or []):
+                drifted_names.append(name)
+                continue
+            states.append({
+                'environment': self.env,
+                'dataset_id': self.dataset_id,
+                'document_name': name,
+                'document_id': state['document_id'],
+                'content_hash': state['content_hash'],
+                'segment_hashes': state['segment_hashes'],
+                'synced_on': state['synced_on'],
+                'reconciled_on': now,
+            })
+        if drifted_names:
+            self.record_db.remove_sync_states(self.env, self.dataset_id, drifted_names)
+            for name in drifted_names:
+                self.states.pop(name, None)
+        if states:
+            self.record_db.save_sync_states(states)
+            self.states.update({state['document_name']: state for state in states})
+        print(f"Reconciled sync state of dataset '{self.dataset_id}': {len(states)} documents in sync, "
+              f"{len(drifted_names)} drifted")
@@ -67,6 +67,49 @@ class Config(object):
             setattr(self, f'{key}_path', dir_path)
 
     def _load_additional_config(self):
+        api_config = self.app_config.get('api', {})
+        pool_config = api_config.get('pool', {})
+        self.api_pool_connections = pool_config.get('connections', 10)
+        self.api_pool_maxsize = pool_config.get('maxsize', 10)
+        self.api_pool_block = pool_config.get('block', False)
+        async_config = api_config.get('async', {})
+        self.api_async_max_concurrency = async_config.get('max_concurrency', 32)
+        self.api_async_limit_per_host = async_config.get('limit_per_host', 32)
+        self.api_pagination_max_workers = api_config.get('pagination', {}).get('max_workers', 4)
+        segments_config = api_config.get('segments', {})
+        self.api_segments_max_in_flight = segments_config.get('max_in_flight', 8)
+        self.api_segments_batch_size = segments_config.get('batch_size', 50)
+        self.api_segments_batch_bytes = segments_config.get('batch_bytes', 1048576)
+        self.api_documents_max_in_flight = api_config.get('documents', {}).get('max_in_flight', 8)
+        self.api_rate_limit = api_config.get('rate_limit', {})
+
+        database_config = self.app_config.get('database', {})
+        pool_config = database_config.get('pool', {})
+        self.database_pool_size = pool_config.get('size', 5)
+        self.database_pool_max_overflow = pool_config.get('max_overflow', 10)
+        self.database_pool_pre_ping = pool_config.get('pre_ping', True)
+        self.database_pool_recycle = pool_config.get('recycle', 1800)
+        upsert_config = database_config.get('upsert', {})
+        self.database_upsert_small_batch_rows = upsert_config.get('small_batch_rows', 100)
+        self.database_upsert_chunk_rows = upsert_config.get('chunk_rows', 50000)
+
+        s3_config = self.app_config.get('s3', {})
+        self.s3_max_workers = s3_config.get('max_workers', 16)
+        self.s3_max_concurrency = s3_config.get('max_concurrency', 4)
+        self.s3_multipart_threshold = s3_config.get('multipart_threshold', 8388608)
+        self.s3_multipart_chunksize = s3_config.get('multipart_chunksize', 8388608)
+        self.s3_list_threshold = s3_config.get('list_threshold', 100)
+
+        indexing_config = self.app_config.get('indexing', {})
+        self.indexing_min_interval = indexing_config.get('min_interval', 0.5)
+        self.indexing_max_interval = indexing_config.get('max_interval', 5)
+        self.indexing_backoff_factor = indexing_config.get('backoff_factor', 1.5)
+        self.indexing_timeout = indexing_config.get('timeout', 300)
+
+        sync_state_config = self.app_config.get('sync_state', {})
+        self.sync_state_enabled = sync_state_config.get('enabled', True)
+        self.sync_state_reconcile_interval = sync_state_config.get('reconcile_interval', 86400)
+
         upload_config = self.app_config.get('upload', {})
         excel_config = upload_config.get('excel', {})
         docx_config = upload_config.get('docx', {}).get('dataset', {})
@@ -79,6 +122,12 @@ class Config(object):
         self.details_dataset = docx_config.get('details', '')
         self.summary_dataset = docx_config.get('summary', '')
 
+        images_config = upload_config.get('images', {})
+        self.upload_images_max_count = images_config.get('max_count', 20)
+        self.upload_images_max_bytes = images_config.get('max_bytes', 10485760)
+        self.upload_images_max_workers = images_config.get('max_workers', 4)
+        self.upload_images_max_split = images_config.get('max_split', 5)
+
         export_config = self.app_config.get('export', {})
         self.department = export_config.get('department').strip()
         self.export_file_path = getattr(self, 'upload_dir_path') / Path(
@@ -116,8 +165,8 @@ class Config(object):
     def get_api_config(self, env: str, apps: Optional[list[str]] = None, include_dataset: bool = False):
         env = env.upper()
 
-        fields = ['url']
-        values = [os.getenv(f'{env}_API_SERVER')]
+        fields = ['env', 'url']
+        values = [env, os.getenv(f'{env}_API_SERVER')]
 
         if include_dataset:
             fields.append('dataset_token')
@@ -136,9 +185,20 @@ class Config(object):
         ApiConfig = namedtuple('ApiConfig', fields)
         return ApiConfig(*values)
 
+    def get_rate_limit_config(self, env: str, family: str):
+        RateLimitConfig = namedtuple('RateLimitConfig', ['rate', 'capacity'])
+        default_config = self.api_rate_limit.get('default', {})
+        env_config = self.api_rate_limit.get(env.lower(), {})
+        family_config = (
+                env_config.get(family) or env_config.get('default')
+                or default_config.get(family) or default_config.get('default') or {}
+        )
+        rate = float(family_config.get('rate', 0))
+        return RateLimitConfig(rate, float(family_config.get('capacity', rate or 1)))
+
     def get_s3_config(self, env):
         env = env.upper()
-        S3Config = namedtuple('S3Config', ['access_key_id', 'secret_access_key', 'region', 'bucket'])
+        S3Config = namedtuple('S3Config', ['access_key_id', 'secret_access_key', 'region', 'bucket', 'endpoint_url'])
         access_key_id = os.getenv(f'{env}_ACCESS_KEY_ID')
         secret_access_key = os.getenv(f'{env}_SECRET_ACCESS_KEY')
         region = os.getenv(f'{env}_REGION')
@@ -152,7 +212,7 @@ class Config(object):
             ] if value is None]
             raise ValueError(f"Missing S3 environment variables: {', '.join(missing_vars)}")
 
-        return S3Config(access_key_id, secret_access_key, region, bucket)
+        return S3Config(access_key_id, secret_access_key, region, bucket, os.getenv(f'{env}_ENDPOINT_URL'))
 
     def get_doc_sync_config(self, scenario: str):
         scenario_config = self.app_config.get('sync', {}).get(scenario, {})
@@ -164,7 +224,10 @@ class Config(object):
             preserve_document_order=scenario_config.get('preserve_document_order'),
             preserve_segment_order=scenario_config.get('preserve_segment_order'),
             backup=scenario_config.get('backup'),
-            dataset_mapping=scenario_config.get('dataset_mapping', [])
+            dataset_mapping=scenario_config.get('dataset_mapping', []),
+            max_workers=scenario_config.get('max_workers', 4),
+            diff_existing=scenario_config.get('diff_existing', True),
+            image_mode=scenario_config.get('image_mode', 'upload')
         )
 
     def get_mailbox(self) -> list:
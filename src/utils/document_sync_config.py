@@ -10,3 +10,6 @@ class DocumentSyncConfig(object):
     preserve_segment_order: bool
     backup: bool
     dataset_mapping: list
+    max_workers: int = 4
+    diff_existing: bool = True
+    image_mode: str = 'upload'
@@ -9,6 +9,12 @@ class FileDownloadStrategy(ABC):
     def download_file(self, source_path, destination_dir, skip_if_exists: bool):
         pass
 
+    def download_files(self, source_paths: list[str], destination_dir, skip_if_exists: bool) -> set[str]:
+        return {
+            source_path for source_path in source_paths
+            if self.download_file(source_path, destination_dir, skip_if_exists)
+        }
+
 
 class S3DownloadStrategy(FileDownloadStrategy):
     def __init__(self, s3_handler: S3Handler):
@@ -17,18 +23,15 @@ class S3DownloadStrategy(FileDownloadStrategy):
     def download_file(self, source_paths, destination_dir, skip_if_exists: bool):
         return self.s3_handler.find_and_download_file(source_paths, destination_dir, skip_if_exists)
 
+    def download_files(self, source_paths: list[str], destination_dir, skip_if_exists: bool) -> set[str]:
+        return set(self.s3_handler.download_files(source_paths, destination_dir, skip_if_exists))
+
 
 def download_files(file_paths: dict[str: Path], target_dir: Path, strategy: FileDownloadStrategy,
                    skip_if_exists: bool = False) -> dict[str: Path]:
-    mapping = {}
-
-    for file_uuid, file_path in file_paths.items():
-        destination_path = target_dir / file_path.name
-        if skip_if_exists and destination_path.exists():
-            print(f'skip downloading file as it already exists: {file_path.name}')
-            mapping[file_uuid] = destination_path
-            continue
-
-        if strategy.download_file(str(file_path.as_posix()), target_dir, skip_if_exists):
-            mapping[file_uuid] = destination_path
-    return mapping
+    source_paths = {file_uuid: str(file_path.as_posix()) for file_uuid, file_path in file_paths.items()}
+    downloaded = strategy.download_files(list(set(source_paths.values())), target_dir, skip_if_exists)
+    return {
+        file_uuid: target_dir / file_path.name
+        for file_uuid, file_path in file_paths.items() if source_paths[file_uuid] in downloaded
+    }
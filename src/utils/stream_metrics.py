@@ -0,0 +1,46 @@
+import threading
+from collections import defaultdict
+from typing import Optional
+
+
+class StreamMetrics(object):
+    def __init__(self):
+        self._records = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, time_to_first_token: Optional[float], total_time: float):
+        with self._lock:
+            self._records[agent].append((time_to_first_token, total_time))
+
+    def get_summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            records = {agent: list(values) for agent, values in self._records.items()}
+        summary = {}
+        for agent, values in records.items():
+            first_token_times = [value[0] for value in values if value[0] is not None]
+            total_times = [value[1] for value in values]
+            summary[agent] = {
+                'streams': len(values),
+                'avg_time_to_first_token': (
+                    sum(first_token_times) / len(first_token_times) if first_token_times else 0.0
+                ),
+                'max_time_to_first_token': max(first_token_times, default=0.0),
+                'avg_total_time': sum(total_times) / len(total_times),
+                'max_total_time': max(total_times),
+            }
+        return summary
+
+    def print_summary(self):
+        for agent, summary in self.get_summary().items():
+            print(f"Agent '{agent}': {summary['streams']} streams, "
+                  f"time to first token avg {summary['avg_time_to_first_token']:.2f}s "
+                  f"(max {summary['max_time_to_first_token']:.2f}s), "
+                  f"total stream time avg {summary['avg_total_time']:.2f}s "
+                  f"(max {summary['max_total_time']:.2f}s)")
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+
+
+stream_metrics = StreamMetrics()
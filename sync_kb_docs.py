@@ -1,4 +1,6 @@
 from src.services.dify_platform import DifyPlatform
+from src.services.image_replicator import ImageReplicator
+from src.services.indexing_watcher import indexing_metrics
 from src.utils.config import config
 from src.utils.file_handler import download_files, S3DownloadStrategy
 from src.utils.time_utils import timing
@@ -43,14 +45,8 @@ def replace_images_in_target_knowledge_base_documents(source_kb, target_kb, down
             strategy=download_strategy,
             skip_if_exists=skip_if_exists
         )
-        docs_with_images = [
-            {'id': doc['id'], 'image': [image_local_paths[uuid] for uuid in doc['image'] if uuid in image_local_paths]}
-            for doc in source_docs_with_images if 'id' in doc and 'image' in doc
-        ]
-        target_images = {}
-        for doc in docs_with_images:
-            images_path_to_id = target_kb.upload_images(images_path=doc['image'], doc_name=doc['id'])
-            target_images.update(images_path_to_id)
+        images_path = list(dict.fromkeys(image_local_paths.values()))
+        target_images = target_kb.upload_images(images_path=images_path, doc_name=source_kb.dataset_id)
         images_mapping = {k: target_images[v] for k, v in image_local_paths.items()}
         if not images_mapping:
             print(f"No images to replace in target dataset '{target_kb.dataset_name}'")
@@ -67,6 +63,16 @@ def replace_images_in_target_knowledge_base_documents(source_kb, target_kb, down
                     target_kb.update_segment_in_document(segment)
 
 
+@timing
+def replicate_images_to_target_knowledge_base(source_kb, target_kb, image_replicator, source='db'):
+    source_docs = source_kb.fetch_documents(source=source, with_segment=True, with_image=True) or []
+    images = [image for item in source_docs for image in item['image']]
+    if not images:
+        print(f"No images to replicate to target dataset '{target_kb.dataset_name}'")
+        return
+    image_replicator.replicate(images, target_kb.dataset_id)
+
+
 def main():
     doc_sync_config = config.get_doc_sync_config(scenario='dataset')
 
@@ -81,10 +87,17 @@ def main():
     for mapping in doc_sync_config.dataset_mapping:
         source_kb = source_dify.init_knowledge_base(mapping.get('source'))
         target_kb = target_dify.init_knowledge_base(mapping.get('target'))
-        download_strategy = S3DownloadStrategy(s3_handler=source_dify.s3)
-        replace_images_in_target_knowledge_base_documents(
-            source_kb, target_kb, download_strategy, skip_if_exists=True, source='db'
-        )
+        if doc_sync_config.image_mode == 'replicate':
+            image_replicator = ImageReplicator(
+                source_dify.db, source_dify.s3, target_dify.db, target_dify.s3, doc_sync_config.max_workers
+            )
+            replicate_images_to_target_knowledge_base(source_kb, target_kb, image_replicator, source='db')
+        else:
+            download_strategy = S3DownloadStrategy(s3_handler=source_dify.s3)
+            replace_images_in_target_knowledge_base_documents(
+                source_kb, target_kb, download_strategy, skip_if_exists=True, source='db'
+            )
+    indexing_metrics.print_summary()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,19 @@
+import asyncio
+
+from src.api.async_api import AsyncApi, async_session_pool
+
+
+def test_sessions_and_semaphores_are_dropped_per_loop():
+    api = AsyncApi('http://localhost:1/v1')
+
+    async def run():
+        async with api:
+            api._get_semaphore()
+            assert async_session_pool.get_session(api.base_url) is async_session_pool.get_session(api.base_url)
+        assert api._semaphores == {}
+
+    for _ in range(3):
+        asyncio.run(run())
+
+    assert async_session_pool._sessions == {}
+    assert not async_session_pool._references
@@ -0,0 +1,38 @@
+from unittest import mock
+
+import pytest
+from sqlalchemy import create_engine
+
+from src.database import database as database_module
+from src.database.database import Database
+from src.models.record_database.image_uploads import ImageUploads
+from src.models.record_database.sync_states import SyncStates
+
+
+@pytest.fixture
+def database():
+    database = Database.__new__(Database)
+    database.database_name = 'test'
+    database.db_uri = 'sqlite://'
+    database.engine = create_engine('sqlite://')
+    yield database
+    database_module._schema_caches.pop(database.db_uri, None)
+
+
+def test_bootstrap_fills_schema_cache_once(database):
+    with mock.patch.object(database_module, 'inspect', wraps=database_module.inspect) as inspect:
+        assert database.bootstrap([ImageUploads, SyncStates]) is True
+        calls = inspect.call_count
+        assert database.bootstrap([ImageUploads, SyncStates]) is False
+        assert database.bootstrap([ImageUploads]) is False
+        assert inspect.call_count == calls
+
+    assert database.schema.tables >= {'image_uploads', 'sync_states'}
+    assert database.get_table_primary_key_column_names(ImageUploads) == ['hash_value', 'algorithm', 'environment']
+
+
+def test_bootstrap_runs_again_for_new_tables(database):
+    database.bootstrap([ImageUploads])
+
+    assert database.bootstrap([ImageUploads, SyncStates]) is True
+    assert 'sync_states' in database.schema.primary_keys
@@ -0,0 +1,180 @@
+import datetime
+import uuid
+from unittest import mock
+
+import pandas as pd
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.database.database import Database
+from src.models.record_database.document_backups import DocumentBackups
+from src.models.record_database.image_uploads import ImageUploads
+from src.utils.config import config
+
+
+@pytest.fixture
+def database():
+    database = Database.__new__(Database)
+    database.database_name = 'test'
+    database.db_uri = 'postgresql://test'
+    return database
+
+
+@pytest.fixture
+def session(database):
+    session = mock.MagicMock()
+    with mock.patch.object(Database, 'session', new_callable=mock.PropertyMock, return_value=session):
+        yield session
+
+
+def compile_statement(statement):
+    return statement.compile(dialect=postgresql.dialect())
+
+
+def executed_sql(session) -> list[str]:
+    return [str(compile_statement(call.args[0])) for call in session.execute.call_args_list]
+
+
+def test_format_copy_value_encodes_null_bool_and_numbers():
+    assert Database._format_copy_value(None) == '\\N'
+    assert Database._format_copy_value(True) == 't'
+    assert Database._format_copy_value(False) == 'f'
+    assert Database._format_copy_value(3.0) == '3'
+    assert Database._format_copy_value(3.5) == '3.5'
+    assert Database._format_copy_value(7) == '7'
+
+
+def test_format_copy_value_escapes_text_control_characters():
+    assert Database._format_copy_value('a\tb\nc\rd\\e') == 'a\\tb\\nc\\rd\\\\e'
+
+
+def test_format_copy_value_serializes_json():
+    value = {'keywords': ['销售', 'a\tb'], 'nested': {'flag': True}}
+    assert Database._format_copy_value(value) == '{"keywords": ["销售", "a\\\\tb"], "nested": {"flag": true}}'
+    assert Database._format_copy_value(['x', 1]) == '["x", 1]'
+    assert Database._format_copy_value('销售', is_json=True) == '"销售"'
+    assert Database._format_copy_value(3.0, is_json=True) == '3.0'
+    assert Database._format_copy_value(None, is_json=True) == '\\N'
+
+
+def test_format_copy_value_keeps_timezone_of_aware_datetimes():
+    value = datetime.datetime(2024, 5, 1, 8, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=8)))
+    assert Database._format_copy_value(value) == '2024-05-01T08:30:00+08:00'
+    assert Database._format_copy_value(datetime.date(2024, 5, 1)) == '2024-05-01'
+
+
+def test_copy_rows_writes_tab_separated_text(database):
+    session = mock.MagicMock()
+    cursor = session.connection.return_value.connection.cursor.return_value
+    copied = {}
+    cursor.copy_expert.side_effect = lambda sql, buffer: copied.update(sql=sql, data=buffer.read())
+
+    database._copy_rows(session, 'temp_table', ['hash_value', 'file_id'], [('a\tb', None), ('c', 'd\ne')])
+
+    assert copied['sql'] == 'COPY temp_table (hash_value, file_id) FROM STDIN'
+    assert copied['data'] == 'a\\tb\t\\N\nc\td\\ne\n'
+    cursor.close.assert_called_once()
+
+
+def test_upsert_records_deduplicates_primary_keys(database):
+    session = mock.MagicMock()
+    file_ids = [uuid.uuid4() for _ in range(3)]
+    records = [
+        {'hash_value': 'h1', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': file_ids[0]},
+        {'hash_value': 'h2', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': file_ids[1]},
+        {'hash_value': 'h1', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': file_ids[2], 'unknown': 1},
+    ]
+
+    database.upsert_records(session, ImageUploads, records, track_change=False)
+
+    statement = compile_statement(session.execute.call_args.args[0])
+    assert session.execute.call_count == 1
+    assert statement.params['hash_value_m0'] == 'h1' and statement.params['file_id_m0'] == file_ids[2]
+    assert statement.params['hash_value_m1'] == 'h2'
+    assert 'hash_value_m2' not in statement.params
+    assert 'ON CONFLICT (hash_value, algorithm, environment) DO UPDATE' in str(statement)
+    assert 'image_uploads.file_id::text IS DISTINCT FROM excluded.file_id::text' in str(statement)
+
+
+def test_upsert_records_chunks_by_bind_parameter_limit(database):
+    session = mock.MagicMock()
+    database.MAX_BIND_PARAMETERS = 8
+    records = [
+        {'hash_value': f'h{index}', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': None}
+        for index in range(3)
+    ]
+
+    database.upsert_records(session, ImageUploads, records)
+
+    assert session.execute.call_count == 3
+
+
+def test_update_or_insert_data_upserts_small_batches(database, session):
+    dataframe = pd.DataFrame([
+        {'hash_value': 'h1', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': None, 'extra': 'x'},
+        {'hash_value': 'h2', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': float('nan'), 'extra': 'y'},
+    ])
+    with mock.patch.object(database, '_copy_rows') as copy_rows, \
+            mock.patch.object(database, 'upsert_records') as upsert_records:
+        database.update_or_insert_data(dataframe, ImageUploads)
+
+    copy_rows.assert_not_called()
+    records = upsert_records.call_args.args[2]
+    assert [record['hash_value'] for record in records] == ['h1', 'h2']
+    assert records[1]['file_id'] is None
+    assert 'extra' not in records[0] and records[0]['created_by'] == 'Created By Script'
+    session.commit.assert_called_once()
+
+
+def test_update_or_insert_data_copies_large_batches_in_chunks(database, session):
+    dataframe = pd.DataFrame([
+        {'hash_value': f'h{index}', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': None}
+        for index in range(5)
+    ])
+    with mock.patch.object(config, 'database_upsert_small_batch_rows', 2), \
+            mock.patch.object(config, 'database_upsert_chunk_rows', 2), \
+            mock.patch.object(database, 'get_table_primary_key_column_names',
+                              return_value=['hash_value', 'algorithm', 'environment']), \
+            mock.patch.object(database, '_copy_rows') as copy_rows, \
+            mock.patch.object(database, 'upsert_records') as upsert_records:
+        database.update_or_insert_data(dataframe, ImageUploads, temp_table_name='temp_uploads', track_change=False)
+
+    upsert_records.assert_not_called()
+    assert [len(call.args[3]) for call in copy_rows.call_args_list] == [2, 2, 1]
+    assert copy_rows.call_args.args[2] == ['hash_value', 'algorithm', 'environment', 'file_id']
+    create_sql = str(session.execute.call_args_list[0].args[0])
+    assert create_sql.startswith('CREATE TEMP TABLE temp_uploads ON COMMIT DROP AS SELECT hash_value')
+    merge_sql = executed_sql(session)[1]
+    assert 'INSERT INTO image_uploads (hash_value, algorithm, environment, file_id)' in merge_sql
+    assert 'FROM temp_uploads ON CONFLICT (hash_value, algorithm, environment) DO UPDATE' in merge_sql
+    session.commit.assert_called_once()
+
+
+def test_update_or_insert_data_copy_deduplicates_keys_and_encodes_json(database, session):
+    dataframe = pd.DataFrame([
+        {'hash_value': 'h1', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': 'old'},
+        {'hash_value': 'h2', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': None},
+        {'hash_value': 'h1', 'algorithm': 'sha256', 'environment': 'DEV', 'file_id': 'new'},
+    ])
+    with mock.patch.object(config, 'database_upsert_small_batch_rows', 1), \
+            mock.patch.object(database, 'get_table_primary_key_column_names',
+                              return_value=['hash_value', 'algorithm', 'environment']), \
+            mock.patch.object(database, '_copy_rows') as copy_rows:
+        database.update_or_insert_data(dataframe, ImageUploads, track_change=False)
+
+    assert copy_rows.call_args.args[3] == [('h2', 'sha256', 'DEV', None), ('h1', 'sha256', 'DEV', 'new')]
+
+    dataframe = pd.DataFrame([
+        {'id': uuid.uuid4(), 'document_name': 'doc', 'keywords': keywords} for keywords in ('plain', ['a'])
+    ])
+    with mock.patch.object(config, 'database_upsert_small_batch_rows', 1), \
+            mock.patch.object(database, 'get_table_primary_key_column_names', return_value=['id']), \
+            mock.patch.object(database, '_copy_rows') as copy_rows:
+        database.update_or_insert_data(dataframe, DocumentBackups, track_change=False)
+
+    assert copy_rows.call_args.args[4] == {'keywords'}
+    cursor = session.connection.return_value.connection.cursor.return_value
+    copied = {}
+    cursor.copy_expert.side_effect = lambda sql, buffer: copied.update(data=buffer.read())
+    database._copy_rows(session, 'temp', ['document_name', 'keywords'], [('doc', 'plain'), ('doc', ['a'])], {'keywords'})
+    assert copied['data'] == 'doc\t"plain"\ndoc\t["a"]\n'
@@ -0,0 +1,88 @@
+import json
+from unittest import mock
+
+import pytest
+from urllib3.exceptions import ConnectTimeoutError
+
+from src.api.dataset_api import DatasetApi
+from src.api.response import Response
+
+
+def make_segment(content, keywords=None):
+    return {'content': content, 'answer': '', 'keywords': keywords or []}
+
+
+def payload_bytes(segment):
+    return len(json.dumps(DatasetApi._build_segment_payload(segment), ensure_ascii=False).encode('utf-8'))
+
+
+def test_split_segment_batches_limits_batch_size():
+    segments = [make_segment(str(index)) for index in range(5)]
+
+    batches = DatasetApi._split_segment_batches(segments, max_batch_size=2, max_batch_bytes=10 ** 6)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [segment for batch in batches for segment in batch] == segments
+
+
+def test_split_segment_batches_limits_payload_bytes():
+    segments = [make_segment('a' * 100), make_segment('b' * 100), make_segment('c' * 10)]
+    max_batch_bytes = payload_bytes(segments[1]) + payload_bytes(segments[2])
+
+    batches = DatasetApi._split_segment_batches(segments, max_batch_size=10, max_batch_bytes=max_batch_bytes)
+
+    assert [len(batch) for batch in batches] == [1, 2]
+
+
+def test_split_segment_batches_keeps_oversized_segment_alone():
+    segments = [make_segment('a' * 1000), make_segment('b')]
+
+    batches = DatasetApi._split_segment_batches(segments, max_batch_size=10, max_batch_bytes=100)
+
+    assert [len(batch) for batch in batches] == [1, 1]
+
+
+def test_split_segment_batches_counts_utf8_bytes():
+    segments = [make_segment('销' * 40), make_segment('售' * 40)]
+
+    segment_bytes = payload_bytes(segments[0])
+
+    assert segment_bytes > 120
+    assert len(DatasetApi._split_segment_batches(segments, 10, max_batch_bytes=2 * segment_bytes - 1)) == 2
+    assert len(DatasetApi._split_segment_batches(segments, 10, max_batch_bytes=2 * segment_bytes)) == 1
+
+
+def test_get_created_segment_ids_orders_by_position():
+    response_data = {'data': [{'id': 'second', 'position': 2}, {'id': 'first', 'position': 1}]}
+
+    assert DatasetApi._get_created_segment_ids(response_data, [{}, {}], 'document') == ['first', 'second']
+
+
+@pytest.mark.parametrize('response_data', [None, {}, {'data': [{'id': 'only', 'position': 1}]}])
+def test_get_created_segment_ids_rejects_count_mismatch(response_data):
+    with pytest.raises(ValueError):
+        DatasetApi._get_created_segment_ids(response_data, [{}, {}], 'document')
+
+
+def make_document_response(document_id, enabled=True):
+    return Response(200, {key: None for key in DatasetApi.DOCUMENT_KEYS} | {'id': document_id, 'enabled': enabled})
+
+
+def test_get_documents_skips_failed_fetches_and_filters_enabled():
+    api = DatasetApi.__new__(DatasetApi)
+    responses = {
+        'datasets/d/documents/a': make_document_response('a'),
+        'datasets/d/documents/b': Response(None, None),
+        'datasets/d/documents/c': make_document_response('c', enabled=False),
+    }
+    with mock.patch.object(api, 'get', side_effect=lambda endpoint, **kwargs: responses[endpoint]):
+        documents = api.get_documents('d', ['a', 'b', 'c'], is_enabled=True, max_in_flight=2)
+
+    assert [document['id'] for document in documents] == ['a']
+
+
+def test_get_documents_raises_when_every_fetch_fails():
+    api = DatasetApi.__new__(DatasetApi)
+    api.base_url = 'http://dify/v1'
+    with mock.patch.object(api, 'get', return_value=Response(None, None)), pytest.raises(ConnectTimeoutError):
+        api.get_documents('d', ['a', 'b'], max_in_flight=2)
@@ -0,0 +1,37 @@
+import uuid
+from unittest import mock
+
+from sqlalchemy import Column, MetaData, Table, create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Database
+from src.database.dify_database import DifyDatabase
+from src.models.dify_database.datasets import Datasets
+from src.models.dify_database.documents import Documents
+
+
+def test_iter_documents_streams_rows_and_loads_segments_per_chunk():
+    engine = create_engine('sqlite://')
+    metadata = MetaData()
+    tables = {
+        model.__tablename__: Table(model.__tablename__, metadata, *[
+            Column(column.name, column.type, primary_key=column.primary_key) for column in model.__table__.columns
+        ]) for model in (Datasets, Documents)
+    }
+    metadata.create_all(engine)
+    dataset_id = uuid.uuid4()
+    with engine.begin() as connection:
+        connection.execute(insert(tables['datasets']), [{'id': dataset_id}])
+        connection.execute(insert(tables['documents']), [
+            {'id': uuid.uuid4(), 'dataset_id': dataset_id, 'position': index, 'name': f'doc {index}', 'enabled': True}
+            for index in range(5)
+        ])
+    database = DifyDatabase.__new__(DifyDatabase)
+    factory = sessionmaker(bind=engine)
+    with mock.patch.object(Database, 'session', new_callable=mock.PropertyMock, side_effect=factory), \
+            mock.patch.object(database, 'get_segments_by_document_ids', return_value={}) as get_segments:
+        documents = list(database.iter_documents(dataset_id, with_segment=True, chunk_size=2))
+
+    assert sorted(document['name'] for document in documents) == [f'doc {index}' for index in range(5)]
+    assert [len(call.args[0]) for call in get_segments.call_args_list] == [2, 2, 1]
+    assert all(document['segment'] == [] for document in documents)
@@ -0,0 +1,78 @@
+from src.services.document_diff import diff_segments, document_hash, segments_match, segment_hash
+
+
+def make_segment(content, position=None, keywords=None, enabled=True):
+    segment = {'content': content, 'answer': '', 'keywords': keywords or [], 'enabled': enabled}
+    if position is not None:
+        segment['id'] = f'segment-{position}'
+        segment['position'] = position
+    return segment
+
+
+def test_diff_segments_matches_inserted_head_segment_by_hash():
+    current = [make_segment('a', 1), make_segment('b', 2)]
+    diff = diff_segments(current, [make_segment('new'), make_segment('a'), make_segment('b')])
+
+    assert [segment['id'] for segment in diff.unchanged] == ['segment-1', 'segment-2']
+    assert diff.updated == []
+    assert [segment['content'] for segment in diff.created] == ['new']
+    assert diff.deleted == []
+    assert diff.embeddings_avoided == 2
+    assert not diff.in_order
+
+
+def test_diff_segments_updates_changed_segments_in_place():
+    current = [make_segment('a', 1), make_segment('b', 2), make_segment('c', 3)]
+    diff = diff_segments(current, [make_segment('a'), make_segment('b2'), make_segment('c')])
+
+    assert len(diff.unchanged) == 2
+    assert [(current_segment['id'], segment['content']) for current_segment, segment in diff.updated] == [
+        ('segment-2', 'b2')
+    ]
+    assert diff.created == [] and diff.deleted == []
+    assert diff.in_order
+
+
+def test_diff_segments_deletes_extra_and_creates_missing_segments():
+    current = [make_segment('a', 1), make_segment('b', 2), make_segment('c', 3)]
+    diff = diff_segments(current, [make_segment('a'), make_segment('c'), make_segment('d')])
+
+    assert [segment['id'] for segment in diff.unchanged] == ['segment-1', 'segment-3']
+    assert [segment['id'] for segment in diff.deleted] == ['segment-2']
+    assert [segment['content'] for segment in diff.created] == ['d']
+    assert diff.updated == []
+    assert diff.in_order
+
+
+def test_diff_segments_keeps_moved_segments():
+    current = [make_segment('a', 1), make_segment('b', 2)]
+    diff = diff_segments(current, [make_segment('b'), make_segment('a')])
+
+    assert len(diff.unchanged) == 2
+    assert not diff.changed
+    assert not diff.in_order
+
+
+def test_diff_segments_treats_keyword_and_enabled_changes_as_updates():
+    current = [make_segment('a', 1, keywords=['x']), make_segment('b', 2)]
+    diff = diff_segments(current, [make_segment('a', keywords=['y']), make_segment('b', enabled=False)])
+
+    assert len(diff.updated) == 2
+    assert diff.embeddings_avoided == 0
+
+
+def test_diff_segments_ignores_keywords_when_incoming_has_none():
+    current = [make_segment('a', 1, keywords=['generated'])]
+    diff = diff_segments(current, [make_segment('a')])
+
+    assert len(diff.unchanged) == 1
+
+
+def test_segments_match_and_document_hash():
+    current = [make_segment('b', 2), make_segment('a', 1, keywords=['k'])]
+    segments = [make_segment('a'), make_segment('b')]
+
+    assert segments_match(current, [segment_hash(segment) for segment in segments]) is False
+    assert segments_match(current, [segment_hash(segment, with_keywords=False) for segment in segments])
+    assert document_hash({'name': 'doc', 'segment': segments}) == document_hash({'name': 'doc', 'segment': segments})
+    assert document_hash({'name': 'doc', 'segment': segments}) != document_hash({'name': 'other', 'segment': segments})
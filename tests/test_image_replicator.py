@@ -0,0 +1,119 @@
+import uuid
+from unittest import mock
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from src.database.dify_database import DifyDatabase
+from src.services.image_replicator import ImageReplicator
+from src.services.s3_handler import S3Handler
+from sync_kb_docs import replicate_images_to_target_knowledge_base
+
+REGION = 'us-east-1'
+SOURCE_TENANT_ID = uuid.uuid4()
+TARGET_TENANT_ID = uuid.uuid4()
+TARGET_ACCOUNT_ID = uuid.uuid4()
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client('s3', region_name=REGION)
+        client.create_bucket(Bucket='dify-dev')
+        client.create_bucket(Bucket='dify-prod')
+        yield client
+
+
+def make_upload_file(client, content: bytes) -> dict:
+    file_id = uuid.uuid4()
+    key = f'upload_files/{SOURCE_TENANT_ID}/{file_id}.png'
+    client.put_object(Bucket='dify-dev', Key=key, Body=content)
+    return {
+        'id': file_id, 'tenant_id': SOURCE_TENANT_ID, 'storage_type': 's3', 'key': key, 'name': f'{file_id}.png',
+        'size': len(content), 'extension': 'png', 'mime_type': 'image/png', 'created_by_role': 'end_user',
+        'created_by': uuid.uuid4(), 'used': True, 'used_by': uuid.uuid4(),
+    }
+
+
+def make_replicator(client, upload_files: list[dict], existing_file_ids: set = None):
+    source_db = mock.create_autospec(DifyDatabase, instance=True)
+    source_db.get_upload_files.side_effect = lambda file_ids: [
+        dict(upload_file) for upload_file in upload_files if str(upload_file['id']) in file_ids
+    ]
+    target_db = mock.create_autospec(DifyDatabase, instance=True)
+    target_db.get_existing_upload_file_ids.return_value = existing_file_ids or set()
+    target_db.get_dataset_owner.return_value = (TARGET_TENANT_ID, TARGET_ACCOUNT_ID)
+    replicator = ImageReplicator(
+        source_db, S3Handler(None, None, REGION, 'dify-dev', client=client),
+        target_db, S3Handler(None, None, REGION, 'dify-prod', client=client), max_workers=4
+    )
+    return replicator, source_db, target_db
+
+
+def test_replicate_copies_objects_under_target_tenant_and_registers_them(s3_client):
+    upload_files = [make_upload_file(s3_client, f'image {index}'.encode()) for index in range(3)]
+    replicator, source_db, target_db = make_replicator(s3_client, upload_files)
+    file_ids = [str(upload_file['id']) for upload_file in upload_files]
+
+    replicated = replicator.replicate(file_ids + file_ids[:1], 'target-dataset')
+
+    assert replicated == set(file_ids)
+    source_db.get_upload_files.assert_called_once_with(file_ids)
+    target_db.get_dataset_owner.assert_called_once_with('target-dataset')
+    registered = target_db.register_upload_files.call_args.args[0]
+    assert [upload_file['id'] for upload_file in registered] == [upload_file['id'] for upload_file in upload_files]
+    for upload_file, target_upload_file in zip(upload_files, registered):
+        assert target_upload_file['key'] == f'upload_files/{TARGET_TENANT_ID}/{upload_file["id"]}.png'
+        assert target_upload_file['tenant_id'] == TARGET_TENANT_ID
+        assert target_upload_file['created_by'] == TARGET_ACCOUNT_ID
+        assert target_upload_file['used_by'] == TARGET_ACCOUNT_ID
+        assert target_upload_file['created_by_role'] == 'account'
+        body = s3_client.get_object(Bucket='dify-prod', Key=target_upload_file['key'])['Body'].read()
+        assert body == s3_client.get_object(Bucket='dify-dev', Key=upload_file['key'])['Body'].read()
+
+
+def test_replicate_skips_files_already_in_target(s3_client):
+    upload_files = [make_upload_file(s3_client, b'a'), make_upload_file(s3_client, b'b')]
+    existing_file_id = str(upload_files[0]['id'])
+    replicator, source_db, target_db = make_replicator(s3_client, upload_files, {existing_file_id})
+
+    replicated = replicator.replicate([str(upload_file['id']) for upload_file in upload_files], 'target-dataset')
+
+    assert replicated == {str(upload_file['id']) for upload_file in upload_files}
+    source_db.get_upload_files.assert_called_once_with([str(upload_files[1]['id'])])
+    assert [upload_file['id'] for upload_file in target_db.register_upload_files.call_args.args[0]] == [
+        upload_files[1]['id']
+    ]
+    assert s3_client.list_objects_v2(Bucket='dify-prod')['KeyCount'] == 1
+
+
+def test_replicate_does_not_register_files_that_failed_to_copy(s3_client):
+    upload_file = make_upload_file(s3_client, b'a')
+    missing_file = {**make_upload_file(s3_client, b'b'), 'key': f'upload_files/{SOURCE_TENANT_ID}/missing.png'}
+    replicator, _, target_db = make_replicator(s3_client, [upload_file, missing_file])
+
+    replicated = replicator.replicate([str(upload_file['id']), str(missing_file['id'])], 'target-dataset')
+
+    assert replicated == {str(upload_file['id'])}
+    assert [item['id'] for item in target_db.register_upload_files.call_args.args[0]] == [upload_file['id']]
+
+
+def test_replicate_raises_when_target_dataset_is_missing(s3_client):
+    upload_file = make_upload_file(s3_client, b'a')
+    replicator, _, target_db = make_replicator(s3_client, [upload_file])
+    target_db.get_dataset_owner.return_value = None
+
+    with pytest.raises(ValueError):
+        replicator.replicate([str(upload_file['id'])], 'missing-dataset')
+    target_db.register_upload_files.assert_not_called()
+
+
+def test_replicate_images_to_target_handles_empty_source_dataset():
+    source_kb = mock.MagicMock()
+    source_kb.fetch_documents.return_value = None
+    image_replicator = mock.create_autospec(ImageReplicator, instance=True)
+
+    replicate_images_to_target_knowledge_base(source_kb, mock.MagicMock(), image_replicator)
+
+    image_replicator.replicate.assert_not_called()
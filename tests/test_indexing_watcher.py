@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from src.services.indexing_watcher import AsyncIndexingWatcher, IndexingNotCompletedError, IndexingWatcher
+
+
+class FakeApi(object):
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def _next(self, dataset_id, batch_id):
+        self.calls.append(batch_id)
+        return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+    def get_indexing_status(self, dataset_id, batch_id):
+        return self._next(dataset_id, batch_id)
+
+
+class FakeAsyncApi(FakeApi):
+    async def get_indexing_status(self, dataset_id, batch_id):
+        return self._next(dataset_id, batch_id)
+
+
+def test_watcher_polls_each_batch_once_for_all_documents():
+    api = FakeApi({'a': 'indexing', 'b': 'indexing'}, {'a': 'completed', 'b': 'completed'})
+    watcher = IndexingWatcher(api, 'dataset', min_interval=0.01, max_interval=0.01)
+
+    futures = [watcher.watch('batch', 'a'), watcher.watch('batch', 'b')]
+
+    assert [future.result(timeout=5) for future in futures] == ['a', 'b']
+    assert api.calls == ['batch', 'batch']
+
+
+def test_async_watcher_polls_batches_and_reports_failures():
+    api = FakeAsyncApi({'a': 'indexing', 'b': 'indexing'}, {'a': 'completed', 'b': 'error'})
+    watcher = AsyncIndexingWatcher(api, 'dataset', min_interval=0.01, max_interval=0.01)
+
+    async def run():
+        return await asyncio.gather(watcher.wait('batch', 'a'), watcher.wait('batch', 'b'), return_exceptions=True)
+
+    completed, failed = asyncio.run(run())
+
+    assert completed == 'a'
+    assert isinstance(failed, IndexingNotCompletedError)
+    assert api.calls == ['batch', 'batch']
+
+
+def test_async_watcher_times_out_and_restarts_on_new_loop():
+    api = FakeAsyncApi({'a': 'indexing'})
+    watcher = AsyncIndexingWatcher(api, 'dataset', min_interval=0.01, max_interval=0.01, timeout=0.02)
+
+    for _ in range(2):
+        with pytest.raises(IndexingNotCompletedError):
+            asyncio.run(watcher.wait('batch', 'a'))
@@ -0,0 +1,39 @@
+import datetime
+
+import pandas as pd
+from sqlalchemy import create_engine, insert
+
+from src.database.migrations import MIGRATIONS, Migration, get_pending_migrations
+from src.database.record_database import RecordDatabase
+from src.models.record_database.schema_migrations import SchemaMigrations
+
+
+def test_get_pending_migrations_skips_applied_versions():
+    migrations = [Migration(2, 'second', []), Migration(1, 'first', []), Migration(3, 'third', [])]
+    with create_engine('sqlite://').begin() as connection:
+        assert [migration.version for migration in get_pending_migrations(connection, migrations)] == [1, 2, 3]
+
+        connection.execute(insert(SchemaMigrations).values(
+            version=1, description='first', applied_on=datetime.datetime(2024, 1, 1)
+        ))
+        assert [migration.version for migration in get_pending_migrations(connection, migrations)] == [2, 3]
+
+
+def test_migration_versions_are_unique_and_ordered():
+    versions = [migration.version for migration in MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+
+def test_convert_timestamp_columns_parses_unmigrated_text_columns():
+    record_db = RecordDatabase.__new__(RecordDatabase)
+    mails = pd.DataFrame({
+        'sent_on': ['2024-05-01 08:30:00', None],
+        'received_on': [datetime.datetime(2024, 5, 2, 9, 0), None],
+        'subject': ['a', 'b'],
+    })
+
+    mails = record_db.convert_timestamp_columns(mails, ['sent_on', 'received_on', 'missing'])
+
+    assert mails['sent_on'][0].year == 2024 and pd.isna(mails['sent_on'][1])
+    assert mails['received_on'][0] == pd.Timestamp(2024, 5, 2, 9, 0)
+    assert list(mails['subject']) == ['a', 'b']
@@ -0,0 +1,75 @@
+from unittest import mock
+
+import pytest
+
+from src.api.rate_limiter import RateLimiter, TokenBucket, get_retry_delay
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with mock.patch('src.api.rate_limiter.time.monotonic', clock):
+        yield clock
+
+
+def test_reserve_allows_burst_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_reserve_refills_over_time_without_exceeding_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.reserve()
+    bucket.reserve()
+
+    clock.now += 1
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_zero_rate_disables_limiting(clock):
+    bucket = TokenBucket(rate=0, capacity=0)
+
+    assert [bucket.reserve() for _ in range(100)] == [0.0] * 100
+
+
+def test_pause_delays_every_reservation(clock):
+    bucket = TokenBucket(rate=0, capacity=1)
+    bucket.pause(5)
+
+    assert bucket.reserve() == pytest.approx(5.0)
+    clock.now += 2
+    bucket.pause(1)
+    assert bucket.reserve() == pytest.approx(3.0)
+    clock.now += 3
+    assert bucket.reserve() == 0.0
+
+
+def test_endpoint_families():
+    assert RateLimiter.get_endpoint_family('chat-messages') == 'chat-messages'
+    assert RateLimiter.get_endpoint_family('datasets/1/documents/2/segments') == 'segments'
+    assert RateLimiter.get_endpoint_family('/datasets/1/documents') == 'datasets'
+    assert RateLimiter.get_endpoint_family('files/upload') == 'default'
+
+
+def test_get_retry_delay_honours_retry_after_only_when_throttled():
+    assert get_retry_delay(429, {'Retry-After': '7'}, 1.0) == 7.0
+    assert get_retry_delay(503, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}, 1.0) == 0.0
+    assert get_retry_delay(429, {'Retry-After': 'soon'}, 1.0) == 1.0
+    assert get_retry_delay(500, {'Retry-After': '7'}, 2.0) == 2.0
+    assert get_retry_delay(None, {}, 4.0) == 4.0
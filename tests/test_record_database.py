@@ -0,0 +1,47 @@
+import datetime
+import uuid
+from unittest import mock
+
+import pytest
+from sqlalchemy import Column, MetaData, Table, create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Database
+from src.database.record_database import RecordDatabase
+from src.models.record_database.mails import Mails
+
+
+@pytest.fixture
+def record_database():
+    engine = create_engine('sqlite://')
+    mails = Table('mails', MetaData(), *[
+        Column(column.name, column.type, primary_key=column.primary_key) for column in Mails.__table__.columns
+    ])
+    mails.create(engine)
+    sent_on = [datetime.datetime(2024, 1, day) for day in (3, 1, 2)] + [None, datetime.datetime(2024, 1, 1)]
+    with engine.begin() as connection:
+        connection.execute(insert(mails), [
+            {'id': uuid.uuid4(), 'subject': f'mail {index}', 'category': 'A', 'sent_on': value}
+            for index, value in enumerate(sent_on)
+        ])
+    record_database = RecordDatabase.__new__(RecordDatabase)
+    factory = sessionmaker(bind=engine)
+    with mock.patch.object(Database, 'session', new_callable=mock.PropertyMock, side_effect=factory) as session:
+        yield record_database, session
+
+
+@pytest.mark.parametrize('sort_order', [None, 'asc', 'desc'])
+def test_iter_mails_reads_keyset_chunks_with_short_sessions(record_database, sort_order):
+    record_database, session = record_database
+
+    chunks = list(record_database.iter_mails(columns=['subject', 'sent_on'], sort_order=sort_order, chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert session.call_count == 3
+    assert list(chunks[0].columns) == ['subject', 'sent_on']
+    subjects = [subject for chunk in chunks for subject in chunk['subject']]
+    assert sorted(subjects) == [f'mail {index}' for index in range(5)]
+    if sort_order is not None:
+        ordered = subjects if sort_order == 'asc' else subjects[::-1]
+        assert ordered[:3] == ['mail 1', 'mail 4', 'mail 2'] or ordered[:3] == ['mail 4', 'mail 1', 'mail 2']
+        assert ordered[3:] == ['mail 0', 'mail 3']
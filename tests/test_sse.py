@@ -0,0 +1,39 @@
+from src.api.sse import SseParser, iter_sse_events
+
+
+def test_parser_joins_multiline_data_and_ignores_comments():
+    parser = SseParser()
+
+    assert parser.feed(b': keep-alive\n') is None
+    assert parser.feed('event: message\n') is None
+    assert parser.feed('data: {"event": "message",\n') is None
+    assert parser.feed('data:  "answer": "hi"}\r\n') is None
+    assert parser.feed('\n') == {'event': 'message', 'answer': 'hi'}
+    assert parser.flush() is None
+
+
+def test_parser_skips_invalid_and_non_object_events():
+    parser = SseParser()
+
+    parser.feed('data: {not json')
+    assert parser.feed('') is None
+    parser.feed('data: [1, 2]')
+    assert parser.feed('') is None
+
+
+def test_iter_sse_events_flushes_trailing_event_without_blank_line():
+    lines = [
+        b'data: {"event": "message", "answer": "a"}\n',
+        b'\n',
+        b'\n',
+        'data: {"event": "message_end"}'.encode('utf-8'),
+    ]
+
+    assert list(iter_sse_events(lines)) == [{'event': 'message', 'answer': 'a'}, {'event': 'message_end'}]
+
+
+def test_parser_decodes_utf8_bytes():
+    parser = SseParser()
+
+    parser.feed('data: {"answer": "你好"}'.encode('utf-8'))
+    assert parser.flush() == {'answer': '你好'}
@@ -0,0 +1,151 @@
+import datetime
+from unittest import mock
+
+from src.services.document_diff import segment_hash
+from src.services.knowledge_base import KnowledgeBase
+from src.services.sync_state import SyncStateStore
+from src.utils.document_sync_config import DocumentSyncConfig
+
+
+class FakeRecordDatabase(object):
+    def __init__(self):
+        self.states = {}
+
+    def get_sync_states(self, environment, dataset_id):
+        return [dict(state) for state in self.states.values()]
+
+    def save_sync_states(self, states):
+        self.states.update({state['document_name']: dict(state) for state in states})
+
+    def remove_sync_states(self, environment, dataset_id, document_names):
+        for name in document_names:
+            self.states.pop(name, None)
+
+
+class FakeDifyDatabase(object):
+    def __init__(self, documents=None):
+        self.documents = {document['id']: document for document in documents or []}
+
+    def get_existing_document_ids(self, dataset_id, document_ids, is_enabled=None):
+        return {document_id for document_id in document_ids if document_id in self.documents}
+
+    def get_documents(self, dataset_id, with_segment=False):
+        return list(self.documents.values())
+
+
+def make_document(name, *contents):
+    return {'name': name, 'segment': [{'content': content, 'answer': '', 'enabled': True} for content in contents]}
+
+
+def make_store(db=None, record_db=None, reconcile_interval=86400):
+    return SyncStateStore('DEV', 'dataset', record_db or FakeRecordDatabase(), db, reconcile_interval)
+
+
+def test_get_unchanged_returns_only_documents_with_matching_hash():
+    db = FakeDifyDatabase([{'id': 'id-a'}, {'id': 'id-b'}])
+    store = make_store(db)
+    store.record([make_document('a', 'x'), make_document('b', 'y')], {'a': 'id-a', 'b': 'id-b'})
+
+    assert store.get_unchanged([make_document('a', 'x'), make_document('b', 'changed'), make_document('c')]) == {
+        'a': 'id-a'
+    }
+
+
+def test_get_unchanged_forgets_documents_missing_from_dify():
+    record_db = FakeRecordDatabase()
+    store = make_store(FakeDifyDatabase([{'id': 'id-b'}]), record_db)
+    store.record([make_document('a', 'x'), make_document('b', 'y')], {'a': 'id-a', 'b': 'id-b'})
+
+    assert store.get_unchanged([make_document('a', 'x'), make_document('b', 'y')]) == {'b': 'id-b'}
+    assert set(record_db.states) == {'b'}
+
+
+def test_reconcile_drops_drifted_documents():
+    segment = {'content': 'x', 'answer': '', 'enabled': True, 'position': 1}
+    db = FakeDifyDatabase([
+        {'id': 'id-a', 'name': 'a', 'segment': [segment]},
+        {'id': 'id-b', 'name': 'b', 'segment': [{**segment, 'content': 'edited in dify'}]},
+    ])
+    record_db = FakeRecordDatabase()
+    store = make_store(db, record_db, reconcile_interval=0)
+    store.record(
+        [make_document('a', 'x'), make_document('b', 'x'), make_document('c', 'x')],
+        {'a': 'id-a', 'b': 'id-b', 'c': 'id-c'}
+    )
+
+    assert store.needs_reconcile()
+    store.reconcile()
+
+    assert set(record_db.states) == {'a'}
+    assert store.states['a']['segment_hashes'] == [segment_hash({'content': 'x', 'answer': '', 'enabled': True},
+                                                                with_keywords=False)]
+
+
+def test_needs_reconcile_after_interval():
+    store = make_store(FakeDifyDatabase(), reconcile_interval=3600)
+    store.record([make_document('a', 'x')], {'a': 'id-a'})
+    assert not store.needs_reconcile()
+
+    store.states['a']['reconciled_on'] -= datetime.timedelta(hours=2)
+    assert store.needs_reconcile()
+
+
+def test_sync_recreates_document_deleted_before_sync():
+    api = mock.MagicMock()
+    db = FakeDifyDatabase([{'id': 'old-id'}])
+    kb = KnowledgeBase('DEV', 'dataset', 'Mails', api, db, FakeRecordDatabase())
+    sync_config = DocumentSyncConfig(
+        skip_existing=False, replace_existing=True, remove_extra=False, preserve_document_order=True,
+        preserve_segment_order=True, backup=False, dataset_mapping=[]
+    )
+    document = make_document('Mail - 2024', 'body')
+    kb.sync_state.record([document], {'Mail - 2024': 'old-id'})
+
+    kb.delete_documents(['old-id'])
+    assert 'Mail - 2024' not in kb.sync_state.states
+    db.documents.clear()
+    with mock.patch.object(kb, '_fetch_and_filter_current_documents', return_value=([], [], [])), \
+            mock.patch.object(kb, 'create_document_by_text', return_value={'Mail - 2024': 'new-id'}) as create:
+        mapping = kb.sync_documents(make_document('Mail - 2024', 'body'), sync_config)
+
+    api.delete_document.assert_called_once_with('dataset', 'old-id')
+    create.assert_called_once()
+    assert mapping == {'Mail - 2024': 'new-id'}
+    assert kb.sync_state.states['Mail - 2024']['document_id'] == 'new-id'
+
+
+def test_empty_dataset_and_disable_forget_sync_state():
+    api = mock.MagicMock()
+    api.get_documents_in_dataset.return_value = [{'id': 'id-a'}]
+    kb = KnowledgeBase('DEV', 'dataset', 'Mails', api, FakeDifyDatabase(), FakeRecordDatabase())
+    kb.sync_state.record([make_document('a', 'x'), make_document('b', 'y')], {'a': 'id-a', 'b': 'id-b'})
+
+    kb.empty_dataset()
+    assert set(kb.sync_state.states) == {'b'}
+
+    with mock.patch.object(kb, 'fetch_documents', return_value=[]):
+        kb.disable_documents(['id-b'])
+    assert kb.sync_state.states == {}
+
+
+def test_diff_existing_recreates_documents_whose_segment_order_cannot_be_kept():
+    api = mock.MagicMock()
+    api.iter_segments_from_documents.return_value = [
+        ('id-a', [{'id': 's1', 'content': 'x', 'answer': '', 'enabled': True, 'position': 1}]),
+        ('id-b', [{'id': 's2', 'content': 'x', 'answer': '', 'enabled': True, 'position': 1}]),
+    ]
+    kb = KnowledgeBase('DEV', 'dataset', 'Mails', api, FakeDifyDatabase(), FakeRecordDatabase())
+    sync_config = DocumentSyncConfig(
+        skip_existing=False, replace_existing=True, remove_extra=False, preserve_document_order=True,
+        preserve_segment_order=True, backup=False, dataset_mapping=[]
+    )
+    documents = [make_document('a', 'new', 'x'), make_document('b', 'x', 'new')]
+    current_documents = [{'id': 'id-a', 'name': 'a'}, {'id': 'id-b', 'name': 'b'}]
+
+    with mock.patch.object(kb, '_create_segments') as create_segments:
+        mapping = kb._diff_existing_documents(documents, current_documents, ['id-a', 'id-b'], sync_config)
+
+    assert sync_config.diff_existing
+    assert mapping == {'b': 'id-b'}
+    api.delete_document.assert_called_once_with('dataset', 'id-a')
+    create_segments.assert_called_once_with('id-b', [documents[1]['segment'][1]])
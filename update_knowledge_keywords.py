@@ -1,8 +1,10 @@
+import asyncio
 import os
 
 from src.database.record_database import RecordDatabase
 from src.services.dify_platform import DifyPlatform
 from src.utils.config import config
+from src.utils.stream_metrics import stream_metrics
 from src.utils.hash_calculator import HashCalculator
 
 
@@ -50,6 +52,18 @@ def generate_keywords(text: str, re_generate_keywords: bool) -> list:
     return keywords
 
 
+async def update_segments(async_kb, segments: list[dict]):
+    async def update_segment(segment):
+        if segment.get('enabled'):
+            await async_kb.update_segment_in_document(segment)
+        else:
+            await async_kb.update_segment_in_document({**segment, 'enabled': True})
+            await async_kb.update_segment_in_document(segment)
+
+    async with async_kb:
+        await asyncio.gather(*(update_segment(segment) for segment in segments))
+
+
 def main():
     re_generate_keywords = False
 
@@ -60,8 +74,8 @@ def main():
     if dataset_document_mapping:
         for item in dataset_document_mapping:
             kb = platform.init_knowledge_base(item['dataset'])
-            for doc_id in item['document_ids']:
-                document = kb.fetch_documents(source='db', document_id=doc_id, with_segment=True)
+            segments_to_update = []
+            for document in kb.fetch_documents(source='db', with_segment=True, document_ids=item['document_ids']):
                 print(f"Updating keywords for document '{document['name']}' in dataset '{kb.dataset_name}'")
                 for segment in document['segment']:
                     default_keywords = segment['keywords'] + [os.path.splitext(document['name'])[0]]
@@ -70,14 +84,9 @@ def main():
                         segment['keywords'] = keywords
                     else:
                         segment['keywords'] = default_keywords
-                    original_status = segment.get('enabled')
-                    if original_status:
-                        kb.update_segment_in_document(segment)
-                    else:
-                        segment['enabled'] = True
-                        kb.update_segment_in_document(segment)
-                        segment['enabled'] = False
-                        kb.update_segment_in_document(segment)
+                    segments_to_update.append(segment)
+            asyncio.run(update_segments(platform.init_async_knowledge_base(item['dataset']), segments_to_update))
+    stream_metrics.print_summary()
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 import re
 
 from src.services.dify_platform import DifyPlatform
+from src.services.indexing_watcher import indexing_metrics
 from src.utils.config import config
 from src.utils.docx_handler import DocxHandler
 from src.utils.folder_handler import FolderHandler
@@ -79,6 +80,7 @@ def main():
     erp_data = get_erp_data(config.erp_dir, kb)
     print('ERP data length:', len(erp_data))
     kb.sync_documents(erp_data, sync_config=config.get_doc_sync_config(scenario='file'))
+    indexing_metrics.print_summary()
 
 
 if __name__ == '__main__':
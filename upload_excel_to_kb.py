@@ -1,7 +1,9 @@
 import threading
 from queue import Queue
 
+from src.api.session_pool import session_pool
 from src.services.dify_platform import DifyPlatform
+from src.services.indexing_watcher import indexing_metrics
 from src.utils.config import config
 from src.utils.excel_handler import ExcelHandler
 from src.utils.time_utils import timing
@@ -87,6 +89,8 @@ def upload_data_list_multithread(customer_data, num_threads):
         thread.start()
 
     queue.join()
+    session_pool.print_stats()
+    indexing_metrics.print_summary()
 
 
 def main():
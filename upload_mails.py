@@ -10,6 +10,7 @@ from src.database.record_database import RecordDatabase
 from src.services.dify_platform import DifyPlatform
 from src.services.keywords_agent import KeywordsAgent
 from src.utils.config import config
+from src.utils.stream_metrics import stream_metrics
 from src.utils.proofpoint_url_decoder import decode_ppv3
 from src.utils.web_scraper import scrape_web_page_content
 
@@ -131,7 +132,7 @@ def extract_info(row, keywords_agent: KeywordsAgent = None):
             summary_segment.append(create_segment(category, content, keywords_agent, summary=True))
             details_segment.append(create_segment(category, content, keywords_agent, summary=False))
 
-    document_name = f'{row["subject"]} - {row["sent_on"][:4]}'
+    document_name = f'{row["subject"]} - {row["sent_on"].year}'
 
     summary_document = {
         'name': document_name,
@@ -298,13 +299,14 @@ def convert_text_to_structured_list(s: str) -> list:
 
 def record_mails(mails):
     record_db = RecordDatabase('record')
+    mail_ids = record_db.get_mail_ids_by_entry_ids([mail.get('entry_id') for mail in mails])
     for mail in mails:
-        mail_id = record_db.get_mail_id_by_entry_id(mail.get('entry_id'))
-        if mail_id:
-            mail['id'] = mail_id
-        else:
-            mail['id'] = str(uuid.uuid4())
-    record_db.save_mails(pd.DataFrame(mails), ignored_columns=['message_id', 'cleaned_body'])
+        entry_id = (mail.get('entry_id') or '').lower()
+        mail['id'] = mail_ids.setdefault(entry_id, str(uuid.uuid4())) if entry_id else str(uuid.uuid4())
+    if mails:
+        record_db.save_mails(
+            pd.DataFrame(mails).drop_duplicates(subset='id', keep='last'), ignored_columns=['message_id', 'cleaned_body']
+        )
 
 
 def proces_content(content):
@@ -324,14 +326,15 @@ def proces_content(content):
 
 def process_mails(time_delta, force_convert: bool = False):
     record_db = RecordDatabase('record')
-    mails = record_db.get_mails(get_recent_updated=True, time_delta=time_delta, sort_order='asc')
-    for index, row in mails.iterrows():
-        if force_convert or (not row['cleaned_body']):
-            row['cleaned_body'] = convert_text_to_structured_list(row['body'])
-        else:
-            for item in row['cleaned_body']:
-                item['content'] = [proces_content(content) for content in item['content']]
-        record_db.save_mails(pd.DataFrame([row]), ignored_columns=['message_id'])
+    for mails in record_db.iter_mails(['id', 'body', 'cleaned_body'], get_recent_updated=True,
+                                      time_delta=time_delta, sort_order='asc'):
+        for index, row in mails.iterrows():
+            if force_convert or (not row['cleaned_body']):
+                mails.at[index, 'cleaned_body'] = convert_text_to_structured_list(row['body'])
+            else:
+                for item in row['cleaned_body']:
+                    item['content'] = [proces_content(content) for content in item['content']]
+        record_db.save_mails(mails[['id', 'cleaned_body']])
 
 
 def process_info(info, key: str, dify, record_db, doc_sync_config, source):
@@ -351,14 +354,18 @@ def process_info(info, key: str, dify, record_db, doc_sync_config, source):
         kb = item.get('dataset_object')
         documents_in_kb = kb.fetch_documents(source=source, with_segment=False)
         doc_ids_in_kb = [document['id'] for document in documents_in_kb] if documents_in_kb is not None else []
-        for mail in item.get('mails'):
-            mail_id = mail.get('mail_id')
-            mail_doc_ids_in_record = record_db.get_mail_related_document_ids(mail_id, kb.dataset_id)
-            doc_ids_to_remove = list(set(doc_ids_in_kb) & set(mail_doc_ids_in_record))
-            kb.delete_document(doc_ids_to_remove)
-            docs_name_id_mapping = kb.sync_documents(mail.get('document'), doc_sync_config)
-            for document_id in [value for key, value in docs_name_id_mapping.items()]:
-                record_db.save_mail_document_mapping(mail_id, document_id, kb.dataset_id)
+        mappings = []
+        try:
+            for mail in item.get('mails'):
+                mail_id = mail.get('mail_id')
+                mail_doc_ids_in_record = record_db.get_mail_related_document_ids(mail_id, kb.dataset_id)
+                doc_ids_to_remove = list(set(doc_ids_in_kb) & set(mail_doc_ids_in_record))
+                kb.delete_documents(doc_ids_to_remove)
+                docs_name_id_mapping = kb.sync_documents(mail.get('document'), doc_sync_config)
+                mappings.extend((mail_id, document_id, kb.dataset_id) for document_id in docs_name_id_mapping.values())
+        finally:
+            if mappings:
+                record_db.save_mail_document_mappings(mappings)
 
 
 def upload_mails_to_knowledge_base(env, mails_category: list, doc_sync_config: dict, sync_summary: bool = True,
@@ -366,9 +373,11 @@ def upload_mails_to_knowledge_base(env, mails_category: list, doc_sync_config: d
                                    time_delta: relativedelta = None, keywords_agent: KeywordsAgent = None):
     dify = DifyPlatform(env)
     record_db = RecordDatabase('record')
-    mails = record_db.get_mails(mails_category, get_recent_updated=get_recent_updated, time_delta=time_delta)
-    if not mails.empty:
-        info = mails.apply(extract_info, axis=1, args=(keywords_agent,)).tolist()
+    info = []
+    for mails in record_db.iter_mails(['id', 'subject', 'sent_on', 'category', 'cleaned_body'], mails_category,
+                                      get_recent_updated=get_recent_updated, time_delta=time_delta):
+        info.extend(mails.apply(extract_info, axis=1, args=(keywords_agent,)).tolist())
+    if info:
         if sync_summary:
             process_info(info, 'summary', dify, record_db, doc_sync_config, source='db')
         if sync_details:
@@ -392,6 +401,7 @@ def main():
         time_delta=time_delta,
         keywords_agent=keywords_agent
     )
+    stream_metrics.print_summary()
 
 
 if __name__ == '__main__':